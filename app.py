@@ -5,10 +5,11 @@
 ##### 
 
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pickle
+import collections
+import os
+import uuid
+
+import profiling
 
 st.set_page_config(
     page_title="Online Shopper App",
@@ -16,32 +17,11 @@ st.set_page_config(
     layout="wide"
 )
 
-############# Funtionen, Modelle und Daten laden ####################
-
-# import dataset and cache it (so it has not to be loaded every time)
-@st.cache()
-def load_data():
-    data = pd.read_csv("online_shoppers_app_dev.csv")
-    return(data.dropna())
-data = load_data()
-
-@st.cache()
-def load_variable_explanation():
-    data = pd.read_excel("Variable_Explanation.xlsx")
-    return(data.dropna())
-variable_explanation = load_variable_explanation()
-
-@st.cache(hash_funcs={'xgboost.sklearn.XGBClassifier': id}, allow_output_mutation=True)
-def load_model():
-    filename = "finalized_default_model.sav"
-    loaded_model = pickle.load(open(filename, "rb"))
-    return(loaded_model)
-model = load_model()
-
-#definition for adding more space between paragraphs
-def add_space(lines):
-    for i in range(lines):
-        st.write("\n")
+# stage timings (APP_PROFILE=1) are kept per session for the profiling panel in the sidebar
+def profile_context():
+    return(st.session_state.setdefault("profile_session", uuid.uuid4().hex[:12]),
+           st.session_state.setdefault("profile_records", collections.deque(maxlen=100)))
+profiling.set_context(profile_context)
 
 ################### Einleitung #########################
 
@@ -57,8 +37,178 @@ st.write("Kaufen oder nicht kaufen? Diese Frage stellt sich nicht nur für Besuc
 st.write("Für die Vorhersage wird ein XGBoost-Model verwendet, welches dabei schnell und zuverlässig arbeitet.\
          Die ausschlaggebensten Variablen sind **PageValue**, **Month** und **Visitor Type**.")
 
-if st.checkbox("Klicke hier, um die Erklärung der Variablen anzuzeigen"):
-    st.write(variable_explanation)
+############# Funtionen, Modelle und Daten laden ####################
+
+# pandas, xgboost and the other heavy modules are only imported after the introduction is sent,
+# so the page is not empty while they load at the first start of the server
+import numpy as np
+import pandas as pd
+
+from caching import file_fingerprint
+from contributions import (load_contributions, mean_abs_contributions, plot_explanation, plot_importance,
+                           predict_contributions, reference_path)
+from data_cache import feature_matrix
+from density import density_table, plot_density
+from evaluation import CURVES, load_evaluation, plot_curve
+from fast_model import FAST_DEPTH, FAST_TREES, deviation, holdout_rows, load_fast_model
+from features import FeatureEncoder
+from filter_index import FilterIndex
+from partial_dependence import GRID_SIZE, partial_dependence, plot_partial_dependence
+from probability_plot import SCATTER_LIMIT, plot_probability, probability_histograms
+from probability_store import load_probabilities
+from render_cache import RenderCache
+from resources import DATA_FILE, load_data, load_inference_executor, load_live_models, load_variable_explanation
+from sections import section, section_runs
+from upload_scoring import ResultFiles, score_csv
+
+# data, executor and live models are loaded in resources.py (preloaded by serve.py at server start)
+data = load_data()
+inference = load_inference_executor()
+live_models = load_live_models()
+# a version activated in the registry goes live without a restart
+live_models.refresh()
+
+# one version for the whole rerun, even if a new one goes live in the meantime
+with profiling.stage("load_model"):
+    try:
+        live_model = live_models.current()
+    except LookupError:
+        # the app only reads the registry, the pickled model is taken over once offline
+        st.error("Es ist kein Modell aktiviert. Bitte zuerst das Modell in die Registry übernehmen: "
+                 "`python model_registry.py import finalized_default_model.sav "
+                 "--data online_shoppers_app_dev.csv --activate`")
+        st.stop()
+model = inference.wrap(live_model.model)
+
+# content fingerprints of data and model (+ data), derived results are cached under these keys
+data_fingerprint = file_fingerprint(DATA_FILE)
+model_fingerprint = file_fingerprint(live_model.path, DATA_FILE)
+
+# everything derived from the model is kept for two versions (old and new one during a swap)
+
+# encoder with the fixed column order of the model, used for uploaded data
+@st.cache_resource(max_entries=2)
+def load_encoder(version):
+    return(FeatureEncoder.from_model(model))
+encoder = load_encoder(live_model.version)
+
+# probabilities of the reference data are computed once per model and data version and stored on disk
+@st.cache_resource(max_entries=2)
+def load_revenue_probability(fingerprint):
+    with profiling.stage("inference_reference_data"):
+        return(load_probabilities(model, data, live_model.path, DATA_FILE))
+revenue_probability = load_revenue_probability(model_fingerprint)
+
+# fast mode of the Daten Explorer and the Guessing Game: a small model distilled from the live model
+# (fast_model.py), built once per model and data version; evaluation and upload always use the full model.
+# The distillation runs in the inference executor, within the same thread budget as the predictions
+@st.cache_resource(max_entries=2)
+def load_fast(fingerprint):
+    with profiling.stage("fast_model"):
+        return(inference.wrap(inference.run(load_fast_model, live_model.model, data, live_model.path, DATA_FILE,
+                                            nthread=inference.nthread)))
+
+@st.cache_resource(max_entries=2)
+def load_fast_probability(fingerprint):
+    with profiling.stage("inference_reference_data_fast"):
+        return(load_fast(fingerprint).predict_proba(feature_matrix(data, encoder.feature_names))[:, 1])
+
+# deviation of the fast model from the full model on the reference sessions it was not distilled on,
+# shown with the fast mode
+@st.cache_resource(max_entries=2)
+def load_fast_deviation(fingerprint):
+    holdout = holdout_rows(len(data))
+    return(deviation(revenue_probability[holdout], load_fast_probability(fingerprint)[holdout]))
+
+# large datasets are drawn as 2d histograms instead of single points, binned once per model and data version
+@st.cache_resource(max_entries=4)
+def load_probability_grids(fingerprint, fast):
+    if len(data) <= SCATTER_LIMIT:
+        return(None)
+    with profiling.stage("probability_grids"):
+        return(probability_histograms(data, load_fast_probability(fingerprint) if fast else revenue_probability))
+
+# density curves of all variables are computed in one pass, once per data version
+@st.cache_resource()
+def load_density_curves(data_fingerprint):
+    with profiling.stage("density_curves"):
+        return(density_table(data))
+density_curves = load_density_curves(data_fingerprint)
+
+# PageValues sorted once, with per-month revenue counts for the pie chart
+@st.cache_resource()
+def load_filter_index(data_fingerprint):
+    with profiling.stage("filter_index"):
+        return(FilterIndex(data["PageValues"].to_numpy(), data["Month"].to_numpy(), data["Revenue"].to_numpy()))
+filter_index = load_filter_index(data_fingerprint)
+
+# evaluation curves of the model on the reference data, stored on disk per model and data version
+@st.cache_resource(max_entries=2)
+def load_model_evaluation(fingerprint):
+    with profiling.stage("evaluation"):
+        return(load_evaluation(fingerprint, data["Revenue"].to_numpy(), revenue_probability))
+model_evaluation = load_model_evaluation(model_fingerprint)
+
+# partial dependence / ICE curves, one batch prediction per model version, variable and grid
+@st.cache_resource(max_entries=40)
+def load_partial_dependence(fingerprint, variable, grid_size, fast):
+    with profiling.stage("partial_dependence"):
+        return(partial_dependence(load_fast(fingerprint) if fast else model, data, variable, grid_size=grid_size))
+
+# TreeSHAP contributions of the reference data are computed offline (python contributions.py) and read
+# memory-mapped; exact ones are preferred over approximated ones, None as long as none are computed
+contributions_file = next((path for path in (reference_path(live_model.path, DATA_FILE),
+                                             reference_path(live_model.path, DATA_FILE, approximate=True))
+                           if os.path.exists(path)), None)
+
+@st.cache_resource(max_entries=2)
+def load_reference_importance(contributions_file):
+    if contributions_file is None:
+        return(None)
+    with profiling.stage("reference_importance"):
+        return(mean_abs_contributions(load_contributions(contributions_file)))
+reference_importance = load_reference_importance(contributions_file)
+
+# rows of the reference data used in the guessing game
+GUESSING_GAME_ROWS = slice(16, 27)
+
+# contributions of the guessing game persons, taken from the stored ones or computed for these rows only;
+# in fast mode they are computed from the fast model, so they explain the prediction that is shown
+@st.cache_resource(max_entries=4)
+def load_guessing_game_contributions(fingerprint, contributions_file, fast):
+    if fast:
+        with profiling.stage("guessing_game_contributions_fast"):
+            return(predict_contributions(load_fast(fingerprint), data.iloc[GUESSING_GAME_ROWS][encoder.feature_names].to_numpy(dtype=np.float32)))
+    if contributions_file is not None:
+        return(np.array(load_contributions(contributions_file)[GUESSING_GAME_ROWS]))
+    with profiling.stage("guessing_game_contributions"):
+        return(predict_contributions(model, data.iloc[GUESSING_GAME_ROWS][encoder.feature_names].to_numpy(dtype=np.float32)))
+
+# rendered figures (PNG) shared by all sessions, repeated widget states do not touch matplotlib
+@st.cache_resource()
+def load_render_cache():
+    return(RenderCache())
+render_cache = load_render_cache()
+
+#definition for adding more space between paragraphs
+def add_space(lines):
+    for i in range(lines):
+        st.write("\n")
+
+# every section is a fragment: its widgets only rerun the section itself, not the whole app
+@st.fragment()
+def explanation_section():
+    if st.checkbox("Klicke hier, um die Erklärung der Variablen anzuzeigen"):
+        st.write(load_variable_explanation())
+    if st.checkbox("Klicke hier, um die Wichtigkeit der Variablen für das Modell anzuzeigen"):
+        if reference_importance is None:
+            st.info("Die Beiträge der Variablen (SHAP-Werte) wurden für dieses Modell noch nicht berechnet: python contributions.py")
+        else:
+            st.write("Mittlerer Einfluss jeder Variable auf die Vorhersagen für die Daten des Daten Explorers (SHAP-Werte).")
+            st.image(render_cache.get(("importance", model_fingerprint, contributions_file),
+                                      lambda: plot_importance(reference_importance, encoder.feature_names)),
+                     width="stretch")
+explanation_section()
     
 st.markdown("***")
     
@@ -66,185 +216,239 @@ add_space(5)
 
 st.header("Daten Explorer")
 
-add_space(3)
+# the switch reruns the whole app, it applies to the Daten Explorer and the Guessing Game
+fast_mode = st.toggle("Schneller Modus: ein kleineres Modell ({} Bäume mit Tiefe {}), das die Vorhersagen des \
+                      vollständigen Modells nachbildet".format(FAST_TREES, FAST_DEPTH))
+if fast_mode:
+    fast_deviation = load_fast_deviation(model_fingerprint)
+    st.caption("Abweichung vom vollständigen Modell auf {} Sessions des Daten Explorers, die das kleinere Modell \
+               nicht gelernt hat: im Mittel {:.3f} (höchstens {:.3f}) in der Wahrscheinlichkeit, dieselbe Vorhersage \
+               für {:.1%} der Sessions. Modellgüte und Upload verwenden immer das vollständige Modell.".format(
+                   fast_deviation["sessions"], fast_deviation["mean_abs"], fast_deviation["max_abs"],
+                   fast_deviation["agreement"]))
+    explorer_probability = load_fast_probability(model_fingerprint)
+else:
+    explorer_probability = revenue_probability
+probability_grids = load_probability_grids(model_fingerprint, fast_mode)
 
+add_space(3)
 
-#################### User Input #########################
 
+@st.fragment()
+def explorer_section():
 
-# Introducing three colums for user inputs
-row1_col1, row1_col2, row1_col3 = st.columns([1,1,1])
+#################### User Input #########################
 
-# slider page values
-p_value_max = float(data["PageValues"].max())
-p_value_min = float(data["PageValues"].min())
 
-p_value = row1_col1.slider("Page-Value",
-                  p_value_min,
-                  p_value_max,
-                  (0.0, p_value_max))
+    # Introducing three colums for user inputs
+    row1_col1, row1_col2, row1_col3 = st.columns([1,1,1])
 
-#input für Monat
-monatsnamen = {"Februar": 2, "März": 3, "Mai": 5, "Juni": 6, "Juli": 7, "August": 8, "September": 9, "Oktober": 10, "November": 11, "Dezember": 12}
-month = row1_col2.multiselect("Monat der Session", monatsnamen.keys())
+    # slider page values
+    p_value_max = float(data["PageValues"].max())
+    p_value_min = float(data["PageValues"].min())
 
-if month:
-    Monat = [monatsnamen[n] for n in month]
-else:
-    Monat = [2, 3, 5, 6, 7, 8, 9, 10, 11, 12]
+    p_value = row1_col1.slider("Page-Value",
+                      p_value_min,
+                      p_value_max,
+                      (0.0, p_value_max))
 
-names = data.drop(columns="Revenue").columns
+    #input für Monat
+    monatsnamen = {"Februar": 2, "März": 3, "Mai": 5, "Juni": 6, "Juli": 7, "August": 8, "September": 9, "Oktober": 10, "November": 11, "Dezember": 12}
+    month = row1_col2.multiselect("Monat der Session", monatsnamen.keys())
 
-# input individuelle variablen
-variable = row1_col3.selectbox("Auswahl der Variable", names)
+    if month:
+        Monat = [monatsnamen[n] for n in month]
+    else:
+        Monat = [2, 3, 5, 6, 7, 8, 9, 10, 11, 12]
 
-# creating filtered data set according to slider inputs
-filtered_data = data.loc[(data["PageValues"] >= p_value[0]) & 
-                         (data["PageValues"] <= p_value[1]) &
-                         (data["Month"].isin(Monat)), : ]
+    names = data.columns.drop("Revenue")
 
+    # input individuelle variablen
+    variable = row1_col3.selectbox("Auswahl der Variable", names)
 
-add_space(3)
+    add_space(3)
 
 ############################### Plots #################################
 
-# defining three columns for plots 
+    # defining three columns for plots 
 
-row2_col1, row2_col2, row2_col3  = st. columns([0.7,1,1])
+    row2_col1, row2_col2, row2_col3  = st. columns([0.7,1,1])
 
-st.markdown("***")
+    st.markdown("***")
 
-# Erster Plot 
-row2_col1.subheader("Struktur der Zielvariable")
+    # Erster Plot, depends on the slider and the months only
+    row2_col1.subheader("Struktur der Zielvariable")
 
-if filtered_data.empty:
-    
-    row2_col1.write("\n")
-    row2_col1.write("\n")
-    row2_col1.write("\n")
-    row2_col1.error("Keine Daten erfüllen die Vorgaben.")
-    
-else:
-            
-        
-    fig1, ax = plt.subplots(figsize=(10,6))
-
-    if filtered_data.groupby("Revenue").size().count() == 2:  
-
-        plt.pie(x = filtered_data.groupby("Revenue").size(), explode = (0.05, 0.05), autopct="%.2f%%", pctdistance=0.5, startangle=90, 
-                textprops={'fontsize': 15}, labels = ["No Revenue", "Revenue"], colors = ['#4169E1', 'tomato'])
-        
-# Put matplotlib figure in col 1
-        
-        row2_col1.write("\n")
-        row2_col1.write("\n")
-        row2_col1.write("\n")
-        row2_col1.pyplot(fig1)
-
-    else:
-        
-        row2_col1.write("\n")
-        row2_col1.write("\n")
-        row2_col1.write("\n")
-        row2_col1.info("100% der Daten führen zu Käufen.")
-          
-        
-
-
-
-# Zweiter Plot
+    def pie_section():
+        # counting sessions with and without revenue (no filtered copy of the data is needed)
+        with profiling.stage("filter"):
+            class_counts = filter_index.class_counts(p_value[0], p_value[1], Monat)
+        if min(class_counts) == 0:
+            return(class_counts, None)
 
-fig2 = sns.displot(x=data[variable], height= 3.5, hue=data["Revenue"], kind="kde", palette="Set2")
-row2_col2.subheader("Dichteverteilung der ausgewählten Variable *{}*".format(variable))
-row2_col2.pyplot(fig2)
+        def plot_class_counts():
+            import matplotlib.pyplot as plt
 
+            fig1, ax = plt.subplots(figsize=(10,6))
+            ax.pie(x = class_counts, explode = (0.05, 0.05), autopct="%.2f%%", pctdistance=0.5, startangle=90, 
+                   textprops={'fontsize': 15}, labels = ["No Revenue", "Revenue"], colors = ['#4169E1', 'tomato'])
+            return(fig1)
 
+        # the pie only depends on the two counts
+        return(class_counts, render_cache.get(("pie", data_fingerprint, class_counts), plot_class_counts))
 
-data_proba = data.drop(columns="Revenue").copy()
-probability = pd.DataFrame(model.predict_proba(data_proba))
-data_proba["Revenue Probability"] = probability.iloc[:,1]
-#data_proba[["Probability 0"],["Probability"]] = model.predict_proba(data_proba)
+    class_counts, pie_image = section("pie", (data_fingerprint, p_value, Monat), pie_section)
 
-# Dritter Plot
-row2_col3.subheader("Wahrscheinlichkeit Revenue in Abhängigkeit der Variable *{}*".format(variable))
-
-fig3, ax = plt.subplots(figsize=(10,7.5))
-ax.scatter(data_proba[variable], data_proba["Revenue Probability"], edgecolor='#4d4d4d', label=variable, alpha=0.8)
-ax.set_xlabel(variable, fontsize=15)
-ax.set_ylabel("Wahrscheinlichkeit einer Transaktion", fontsize=15)
-ax.grid()
-ax.legend().set_title("Variable")
-ax.set_facecolor("#f5f5fa")
-row2_col3.pyplot(fig3)
+    row2_col1.write("\n")
+    row2_col1.write("\n")
+    row2_col1.write("\n")
+    if sum(class_counts) == 0:
+        row2_col1.error("Keine Daten erfüllen die Vorgaben.")
+    elif pie_image is None:
+        row2_col1.info("100% der Daten führen zu Käufen.")
+    else:
+        row2_col1.image(pie_image, width="stretch")
+
+    # Zweiter Plot, depends on the variable only
+    row2_col2.subheader("Dichteverteilung der ausgewählten Variable *{}*".format(variable))
+    density_image = section("density", (data_fingerprint, variable),
+                            lambda: render_cache.get(("density", data_fingerprint, variable),
+                                                     lambda: plot_density(*density_curves[variable], variable)))
+    row2_col2.image(density_image, width="stretch")
+
+    # Dritter Plot, depends on the variable and the model
+    row2_col3.subheader("Wahrscheinlichkeit Revenue in Abhängigkeit der Variable *{}*".format(variable))
+    probability_image = section("probability", (model_fingerprint, fast_mode, variable),
+                                lambda: render_cache.get(("probability", model_fingerprint, fast_mode, variable),
+                                                         lambda: plot_probability(data[variable], explorer_probability, variable,
+                                                                                  histogram=None if probability_grids is None else probability_grids[variable])))
+    row2_col3.image(probability_image, width="stretch")
+
+    # Vierter Plot: how the model reacts if only the variable changes, depends on the variable and the model
+    row3_col1, row3_col2 = st.columns([1,2])
+    row3_col1.subheader("Partial Dependence der Variable *{}*".format(variable))
+    row3_col1.write("Für eine Stichprobe von Sessions wird nur *{}* verändert, alle anderen Werte bleiben gleich. \
+                    Die grauen Linien zeigen die Vorhersage für einzelne Sessions (ICE), die rote Linie ihren \
+                    Mittelwert.".format(variable))
+    dependence_image = section("partial_dependence", (model_fingerprint, fast_mode, variable),
+                               lambda: render_cache.get(("partial_dependence", model_fingerprint, fast_mode, variable),
+                                                        lambda: plot_partial_dependence(*load_partial_dependence(model_fingerprint, variable, GRID_SIZE, fast_mode), variable)))
+    row3_col2.image(dependence_image, width="stretch")
+explorer_section()
 
 add_space(7)
 
 ############################# Guessing Game #################################
 
-# create subsample for the guessing game
-test_frac = data.iloc[16:27,:].reset_index().drop(columns="index")
-test_frac["Persons"] = test_frac.index
-test_frac["Persons"].replace({0:"Justus-Aurelius",1:"Daniel",2:"Jule",
-                           3:"David",4:"Tgetg",5:"Lisa",6:"Leo",
-                           7:"Isabel",8:"Maximilian",9:"Lara",10:"Marie"},inplace=True)
-test_frac.set_index("Persons", drop=True, inplace=True)
-test_frac["Prediction"] = model.predict(test_frac.drop(columns="Revenue"))
-test_samples = test_frac[["PageValues","Month","VisitorType_Returning_Visitor"]]
+# create subsample for the guessing game, once per model version and shared by all sessions (read-only)
+@st.cache_resource(max_entries=4)
+def guessing_game_data(fingerprint, contributions_file, fast):
+    test_frac = data.iloc[GUESSING_GAME_ROWS,:].reset_index().drop(columns="index")
+    test_frac["Persons"] = test_frac.index
+    test_frac["Persons"] = test_frac["Persons"].replace({0:"Justus-Aurelius",1:"Daniel",2:"Jule",
+                               3:"David",4:"Tgetg",5:"Lisa",6:"Leo",
+                               7:"Isabel",8:"Maximilian",9:"Lara",10:"Marie"})
+    test_frac.set_index("Persons", drop=True, inplace=True)
+    with profiling.stage("guessing_game_prediction"):
+        # the 11 rows are predicted once per model version, so the booster is used (TreeEngine is not faster for them)
+        test_frac["Prediction"] = (load_fast(fingerprint) if fast else model).predict(feature_matrix(test_frac, encoder.feature_names))
+    test_samples = test_frac[["PageValues","Month","VisitorType_Returning_Visitor"]]
+    test_contributions = load_guessing_game_contributions(fingerprint, contributions_file, fast)
+    return(test_frac, test_samples, test_contributions)
+
+
+@st.fragment()
+def guessing_game_section():
+    test_frac, test_samples, test_contributions = section("guessing_game", (model_fingerprint, contributions_file, fast_mode),
+                                                         lambda: guessing_game_data(model_fingerprint, contributions_file, fast_mode))
+
+    # create two columns for the guessing game
+    row3_col1, row3_col2 = st.columns([1,1])
+
+    ### guessing game
+
+    st.markdown("***")
+
+    row3_col1.header("Guessing Game")
+    row3_col1.write("Wähle eine Person aus und entscheide, basierend auf den Werten \
+                    in der Tabelle, ob eine Transaktion stattfindet oder nicht.")
+    with row3_col1.form(key="sample_form"):
+        sample = st.selectbox("Wähle eine Person aus:", 
+                              test_samples.index)
+        guess = st.radio("Entscheide, ob die ausgewählte Person nach dem Besuch der Shopping-Website \
+                         eine Transaktion durchführt oder nicht.",
+                         ('Transaktion', 'Keine Transaktion'))
+        submit = st.form_submit_button("Submit")
+        if submit:
+            sample_rev = test_frac.loc[test_frac.index == sample, "Revenue"].item()
+            sample_pred = test_frac.loc[test_frac.index == sample, "Prediction"].item()
+            #st.write(test_samples.loc[test_samples.index == sample,])
+            
+            
+            if ((sample_rev == 1) and (guess == "Transaktion")) or((sample_rev == 0) and (guess == "Keine Transaktion")):
+                st.write("Gratulation, deine Vorhersage ist **korrekt**!")
+            elif ~((sample_rev == 0) and (guess == "Keine Transaktion")) or ~((sample_rev == 1) and (guess == "Transaktion")):
+                st.write("Leider ist deine Vorhersage **falsch**.")
+            if sample_rev == 1:
+                st.write("In diesem Fall findet **eine** Transaktion statt.")
+            if sample_rev == 0:
+                st.write("In diesem Fall findet **keine** Transaktion statt.")
+            if ((sample_pred == 0) and (guess == "Keine Transaktion")) or ((sample_pred == 1) and (guess == "Transaktion")):
+                st.write("Die App hat **dieselbe** Vorhersage wie Du getroffen.")
+            elif ~((sample_pred == 0) and (guess == "Keine Transaktion")) or ~((sample_pred == 1) and (guess == "Transaktion")):
+                st.write("Die App hat eine **andere** Vorhersage als Du getroffen.")
+            else: 
+                st.write("Bitte überprüfe deine Eingabe nocheinmal.")
+
+            # explanation of the prediction: the variables that moved it most (SHAP values)
+            person = test_frac.index.get_loc(sample)
+            st.write("Diese Variablen haben die Vorhersage {} am stärksten beeinflusst (rot: Richtung Transaktion):".format(
+                "des schnellen Modells" if fast_mode else "der App"))
+            st.image(render_cache.get(("explanation", model_fingerprint, contributions_file, fast_mode, sample),
+                                      lambda: plot_explanation(test_contributions[person],
+                                                               test_frac[encoder.feature_names].iloc[person].to_numpy(),
+                                                               encoder.feature_names)),
+                     width="stretch")
+
+    ### Display the table with the values for the guessing game        
+    row3_col2.write("\n")
+    row3_col2.write("\n")
+    if row3_col2.checkbox("Klicke hier, um die Werte für jede Person zu sehen."):
+
+        row3_col2.write("Diese Tabelle zeigt für jede Person die drei wichtigsten Werte für die Vorhersage der \
+                        Zielvariable *Revenue*, also ob eine Transaktion stattfindet oder nicht.")
+        table_samples = test_samples.copy()
+        table_samples.rename(columns={"PageValues": "Page-Value in US-Dollar", "Month":"Monat",
+                                      "VisitorType_Returning_Visitor": "Wiederkehrender Kunde"}, inplace=True)
+        table_samples["Monat"] = table_samples["Monat"].replace({2:'Februar',3:"März",5:"Mai",6:"Juni",7:"Juli",8:"August",9:"September",10:"Oktober",11:"November",12:"Dezember"})
+        table_samples["Wiederkehrender Kunde"] = table_samples["Wiederkehrender Kunde"].replace({1:"Ja",0:"Nein"})
+        table_samples.index = table_samples.index.rename("Person")
+        
+        row3_col2.write(table_samples.to_html(), unsafe_allow_html=True)
+guessing_game_section()
 
+############################# Model Evaluation #################################
+add_space(5)
 
-# create two columns for the guessing game
-row3_col1, row3_col2 = st.columns([1,1])
+st.header("Modellgüte", anchor="modellguete")
+st.write("Die Kennzahlen und Kurven beziehen sich auf die Daten des Daten Explorers. Das Modell wurde mit diesen Daten \
+         trainiert, die Werte fallen daher besser aus als für neue Kunden.")
 
-### guessing game
 
-st.markdown("***")
+@st.fragment()
+def evaluation_section():
+    row4_col1, row4_col2 = st.columns([1,2])
 
-row3_col1.header("Guessing Game")
-row3_col1.write("Wähle eine Person aus und entscheide, basierend auf den Werten \
-                in der Tabelle, ob eine Transaktion stattfindet oder nicht.")
-with row3_col1.form(key="sample_form"):
-    sample = st.selectbox("Wähle eine Person aus:", 
-                          test_samples.index)
-    guess = st.radio("Entscheide, ob die ausgewählte Person nach dem Besuch der Shopping-Website \
-                     eine Transaktion durchführt oder nicht.",
-                     ('Transaktion', 'Keine Transaktion'))
-    submit = st.form_submit_button("Submit")
-    if submit:
-        sample_rev = test_frac.loc[test_frac.index == sample, "Revenue"].item()
-        sample_pred = test_frac.loc[test_frac.index == sample, "Prediction"].item()
-        #st.write(test_samples.loc[test_samples.index == sample,])
-        
-        
-        if ((sample_rev == 1) and (guess == "Transaktion")) or((sample_rev == 0) and (guess == "Keine Transaktion")):
-            st.write("Gratulation, deine Vorhersage ist **korrekt**!")
-        elif ~((sample_rev == 0) and (guess == "Keine Transaktion")) or ~((sample_rev == 1) and (guess == "Transaktion")):
-            st.write("Leider ist deine Vorhersage **falsch**.")
-        if sample_rev == 1:
-            st.write("In diesem Fall findet **eine** Transaktion statt.")
-        if sample_rev == 0:
-            st.write("In diesem Fall findet **keine** Transaktion statt.")
-        if ((sample_pred == 0) and (guess == "Keine Transaktion")) or ((sample_pred == 1) and (guess == "Transaktion")):
-            st.write("Die App hat **dieselbe** Vorhersage wie Du getroffen.")
-        elif ~((sample_pred == 0) and (guess == "Keine Transaktion")) or ~((sample_pred == 1) and (guess == "Transaktion")):
-            st.write("Die App hat eine **andere** Vorhersage als Du getroffen.")
-        else: 
-            st.write("Bitte überprüfe deine Eingabe nocheinmal.")
-
-### Display the table with the values for the guessing game        
-row3_col2.write("\n")
-row3_col2.write("\n")
-if row3_col2.checkbox("Klicke hier, um die Werte für jede Person zu sehen."):
-
-    row3_col2.write("Diese Tabelle zeigt für jede Person die drei wichtigsten Werte für die Vorhersage der \
-                    Zielvariable *Revenue*, also ob eine Transaktion stattfindet oder nicht.")
-    table_samples = test_samples.copy()
-    table_samples.rename(columns={"PageValues": "Page-Value in US-Dollar", "Month":"Monat",
-                                  "VisitorType_Returning_Visitor": "Wiederkehrender Kunde"}, inplace=True)
-    table_samples["Monat"].replace({2:'Februar',3:"März",5:"Mai",6:"Juni",7:"Juli",8:"August",9:"September",10:"Oktober",11:"November",12:"Dezember"}, inplace=True)
-    table_samples["Wiederkehrender Kunde"].replace({1:"Ja",0:"Nein"}, inplace=True)
-    table_samples.index = table_samples.index.rename("Person")
-    
-    row3_col2.write(table_samples.to_html(), unsafe_allow_html=True)
+    row4_col1.metric("ROC AUC", "{:.3f}".format(model_evaluation["roc_auc"]))
+    row4_col1.metric("Average Precision", "{:.3f}".format(model_evaluation["average_precision"]))
+    row4_col1.metric("Accuracy", "{:.3f}".format(model_evaluation["accuracy"]))
+    row4_col1.metric("Precision / Recall (Transaktion)", "{:.3f} / {:.3f}".format(model_evaluation["precision"],
+                                                                                 model_evaluation["recall"]))
+    curve = row4_col1.selectbox("Auswahl der Kurve", CURVES.keys(), format_func=CURVES.get)
+
+    curve_image = render_cache.get(("evaluation", model_fingerprint, curve), lambda: plot_curve(model_evaluation, curve))
+    row4_col2.image(curve_image, width="stretch")
+evaluation_section()
 
 ############################# Data Upload and Prediction #################################
 add_space(5)
@@ -252,20 +456,66 @@ add_space(5)
 # predict revenue for uploaded data
 st.header("Upload eigener Daten")
 
-uploaded_data = st.file_uploader("Wähle eine csv-Datei mit Kundendaten aus, um vorherzusagen, ob eine Transaktion stattfindet oder nicht.")
 
-# only make predictions if data is uploaded
-if uploaded_data is not None:
-    new_customers = pd.read_csv(uploaded_data)
-    new_customers = pd.get_dummies(new_customers, drop_first=True)
-    new_customers["predictions"] = model.predict(new_customers)
+@st.fragment()
+def upload_section():
+    uploaded_data = st.file_uploader("Wähle eine csv-Datei mit Kundendaten aus, um vorherzusagen, ob eine Transaktion stattfindet oder nicht.")
+
+    with_contributions = st.checkbox("Auch die Beiträge der Variablen (SHAP-Werte) berechnen (dauert deutlich länger)")
+
+    # only make predictions if data is uploaded
+    if uploaded_data is None:
+        return
+
+    # the upload is scored in chunks into a temporary file, which is reused until another file is uploaded
+    def score_upload():
+        progress = st.progress(0.0)
+        counter = st.empty()
+
+        def show_progress(rows, positives):
+            progress.progress(min(uploaded_data.tell() / max(uploaded_data.size, 1), 1.0))
+            counter.write("{} Kunden bewertet, davon {} mit Transaktion.".format(rows, positives))
+
+        # the files of the previous upload are replaced, all of them are removed when the session ends
+        result_files = st.session_state.setdefault("upload_files", ResultFiles())
+        result_files.clear()
+        out_path = result_files.new(".csv")
+        contributions_path = result_files.new(".npy") if with_contributions else None
+        uploaded_data.seek(0)
+        try:
+            with profiling.stage("upload_scoring"):
+                rows, positives = score_csv(uploaded_data, model, encoder, out_path, on_chunk=show_progress,
+                                            contributions_path=contributions_path)
+        except BaseException:
+            result_files.clear()
+            raise
+        progress.empty()
+        counter.empty()
+        return({"path": out_path, "rows": rows, "positives": positives, "contributions_path": contributions_path})
+
+    scored_upload = section("upload", (model_fingerprint, uploaded_data.file_id, with_contributions), score_upload)
+    st.write("{} Kunden bewertet, davon {} mit Transaktion.".format(scored_upload["rows"], scored_upload["positives"]))
+
+    if scored_upload["contributions_path"] is not None:
+        st.image(render_cache.get(("upload_importance", model_fingerprint, uploaded_data.file_id),
+                                  lambda: plot_importance(mean_abs_contributions(load_contributions(scored_upload["contributions_path"])),
+                                                          encoder.feature_names, "Wichtigkeit der Variablen für die hochgeladenen Kunden")),
+                 width="stretch")
+
+    # the file is only read when the button is clicked, not on every rerun
+    def read_scored_file():
+        with open(scored_upload["path"], "rb") as scored_file:
+            return(scored_file.read())
+
     st.download_button(label="Download vorhergesagte Kunden-Daten",
-                       data=new_customers.to_csv().encode("utf-8"),
-                       file_name="scored_new_customers.csv")
+                       data=read_scored_file,
+                       file_name="scored_new_customers.csv",
+                       mime="text/csv")
 
-# display dataset with predictions
+    # display dataset with predictions (only the first rows, the whole file can be very large)
     if st.checkbox("Klicke hier, wenn Du die vorhergesagten Daten sehen willst"):
-        st.write(new_customers)
+        st.write(pd.read_csv(scored_upload["path"], index_col=0, nrows=1000))
+upload_section()
        
     
     
@@ -292,12 +542,26 @@ st.sidebar.markdown(
 ':trophy: &ensp;'
 '<b><a href="#guessing-game" style="color: black;text-decoration: none;">Guessing Game</a></b><br/><br/>'
 
+':bar_chart: &ensp;'
+'<b><a href="#modellguete" style="color: black;text-decoration: none;">Modellgüte</a></b><br/><br/>'
+
 ':cloud: &ensp;'
 '<b><a href="#upload-eigener-daten" style="color: black;text-decoration: none;">Upload eigener Daten</a></b><br/><br/>'
 
 , unsafe_allow_html=True)
 
 st.sidebar.caption("erstellt von: di Luzio, Rumplmayr, Steiner, Zanoni")
+st.sidebar.caption("Modellversion: {}".format(live_model.version))
+
+# profiling panel, only there if the app runs with APP_PROFILE=1
+if profiling.ENABLED:
+    with st.sidebar.expander("Profiling"):
+        st.write("Stages dieser Session (neueste zuerst):")
+        st.dataframe(pd.DataFrame(list(st.session_state.get("profile_records", []))[::-1],
+                                  columns=["stage", "wall_ms", "peak_kb", "shared"]))
+        st.write("Ausführungen je Abschnitt:", section_runs())
+        st.write("Render-Cache:", render_cache.stats())
+        st.write("Inferenz ({} Threads, {} parallel):".format(inference.threads, inference.workers), inference.stats())
 
 
 
@@ -0,0 +1,187 @@
+#####
+
+# offline batch scoring of large session files on all cores
+
+#####
+
+# usage: python batch_scoring.py sessions/*.csv --out scored/ [--workers 8] [--format parquet] [--version <version>]
+#
+# The input files (csv in the format of new_shoppers.csv or raw data, or parquet)
+# are cut into shards: byte ranges of csv files that end at line breaks, row
+# groups of parquet files. A process pool scores the shards, every worker loads
+# the model of the registry once and then only reads, encodes and predicts.
+# Every shard is written as its own partition (part-<file>-<shard>.parquet/.csv)
+# with the input columns plus "probability" and "predictions". A manifest.json
+# with the model version and the rows per partition is written at the end.
+# The partitions are written to a temporary directory first. Only when all of
+# them are finished do they replace the partitions and manifest of an earlier
+# run in the output directory, so no stale partition stays behind. A failed
+# run leaves the earlier output as it was.
+
+import argparse
+import concurrent.futures
+import glob
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from features import FeatureEncoder
+from model_registry import REGISTRY_DIR, ModelRegistry
+
+# approximate size of a csv shard, small enough for the memory of one worker, large enough to keep overheads low
+SHARD_BYTES = 32 * 1024 * 1024
+# smaller csv shards are used if the inputs would otherwise give fewer than this many shards per worker
+SHARDS_PER_WORKER = 4
+MIN_SHARD_BYTES = 1024 * 1024
+FORMATS = ("parquet", "csv")
+
+
+def csv_shards(path, shard_bytes=SHARD_BYTES):
+    """Split a csv file into ``(path, start, end)`` byte ranges of whole lines (header excluded)."""
+    size = os.path.getsize(path)
+    shards = []
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + shard_bytes, size))
+            # the range ends after the line the cut falls into
+            f.readline()
+            end = min(f.tell(), size)
+            shards.append((path, start, end))
+            start = end
+    return shards
+
+
+def parquet_shards(path):
+    import pyarrow.parquet as pq
+
+    return [(path, group, None) for group in range(pq.ParquetFile(path).num_row_groups)]
+
+
+def read_shard(path, start, end):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).read_row_group(start).to_pandas()
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(start)
+        block = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + block))
+
+
+# model and encoder of a worker process, loaded once by the pool initializer
+_worker = {}
+
+
+def _init_worker(registry_dir, version):
+    # one thread per process, the pool already uses every core
+    loaded = ModelRegistry(registry_dir).load(version, nthread=1)
+    _worker["model"] = loaded.model
+    _worker["encoder"] = FeatureEncoder(loaded.metadata["feature_names"])
+
+
+def _score_shard(shard, name, out_dir, fmt):
+    frame = read_shard(*shard)
+    probability = _worker["model"].predict_proba(_worker["encoder"].transform(frame))[:, 1]
+    frame["probability"] = probability
+    frame["predictions"] = (probability > 0.5).astype("int8")
+    path = os.path.join(out_dir, "{}.{}".format(name, fmt))
+    if fmt == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return {"partition": os.path.basename(path), "rows": len(frame), "positives": int(frame["predictions"].sum())}
+
+
+def score_files(inputs, out_dir, workers=None, fmt="parquet", version=None, registry_dir=REGISTRY_DIR,
+                shard_bytes=SHARD_BYTES, on_shard=None):
+    """Score all ``inputs`` into partitions in ``out_dir`` and return the manifest.
+
+    ``version`` defaults to the active version of the registry.
+    ``on_shard(partition)`` is called whenever a shard is written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("format must be one of {}, got {!r}".format(", ".join(FORMATS), fmt))
+    start = time.perf_counter()
+    registry = ModelRegistry(registry_dir)
+    version = version or registry.active_version()
+    if version is None:
+        raise LookupError("no active model version in {}".format(registry_dir))
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    # enough shards to keep all workers busy until the end
+    csv_bytes = sum(os.path.getsize(path) for path in inputs if not path.endswith(".parquet"))
+    shard_bytes = max(min(shard_bytes, csv_bytes // (workers * SHARDS_PER_WORKER)), MIN_SHARD_BYTES)
+
+    shards = []
+    for i, path in enumerate(inputs):
+        file_shards = parquet_shards(path) if path.endswith(".parquet") else csv_shards(path, shard_bytes)
+        shards += [(shard, "part-{:05d}-{:05d}".format(i, j)) for j, shard in enumerate(file_shards)]
+
+    partitions = []
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=out_dir)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                    initargs=(registry_dir, version)) as pool:
+            futures = [pool.submit(_score_shard, shard, name, tmp_dir, fmt) for shard, name in shards]
+            for future in concurrent.futures.as_completed(futures):
+                partitions.append(future.result())
+                if on_shard is not None:
+                    on_shard(partitions[-1])
+        # the output of an earlier run is removed, the manifest first, so it never lists a missing partition
+        stale = [name for name in sorted(os.listdir(out_dir)) if name.startswith("part-") and name.endswith(FORMATS)]
+        for name in ["manifest.json"] + stale:
+            if os.path.exists(os.path.join(out_dir, name)):
+                os.remove(os.path.join(out_dir, name))
+        for partition in partitions:
+            os.replace(os.path.join(tmp_dir, partition["partition"]), os.path.join(out_dir, partition["partition"]))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    partitions.sort(key=lambda partition: partition["partition"])
+    seconds = time.perf_counter() - start
+    rows = sum(partition["rows"] for partition in partitions)
+    manifest = {"model_version": version,
+                "inputs": [os.path.abspath(path) for path in inputs],
+                "format": fmt,
+                "workers": workers,
+                "rows": rows,
+                "positives": sum(partition["positives"] for partition in partitions),
+                "seconds": seconds,
+                "rows_per_second": rows / seconds if seconds else None,
+                "partitions": partitions}
+    tmp_path = os.path.join(out_dir, "manifest.json.{}.tmp".format(os.getpid()))
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score session files with the revenue model on all cores")
+    parser.add_argument("inputs", nargs="+", help="csv or parquet files, glob patterns are expanded")
+    parser.add_argument("--out", required=True, help="output directory for the partitions")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--format", default="parquet", choices=FORMATS)
+    parser.add_argument("--version", default=None, help="model version, default: the active one")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+
+    inputs = sorted(set(path for pattern in args.inputs for path in (glob.glob(pattern) or [pattern])))
+    manifest = score_files(inputs, args.out, args.workers, args.format, args.version, args.registry,
+                           int(args.shard_mb * 1024 * 1024))
+    print("{} rows ({} with transaction) in {} partitions, {:.1f} s, {:.0f} rows/s with {} workers".format(
+        manifest["rows"], manifest["positives"], len(manifest["partitions"]), manifest["seconds"],
+        manifest["rows_per_second"], manifest["workers"]))
+
+
+if __name__ == "__main__":
+    main()
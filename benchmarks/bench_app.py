@@ -0,0 +1,177 @@
+#####
+
+# headless end-to-end benchmark of the web application on synthetic data
+
+#####
+
+# usage: python benchmarks/bench_app.py [--rows 12k,1M,10M] [--results benchmarks/results.jsonl]
+#
+# For every data size the app is run with streamlit's AppTest (no browser, no
+# server) against a synthetic copy of the data:
+#   cold_start     first run of a new server process without on-disk caches
+#   warm_start     first run of a new server process, on-disk caches present
+#   new_session    first run of another session in the same process
+#   interactions   every step of a fixed sequence of widget changes, each one rerun
+#   upload_scoring scoring a synthetic upload of the same size (AppTest can not
+#                  upload files, so score_csv is timed directly)
+# One JSON line per size is appended to the results file together with the git
+# commit, and the timings are compared with the last result of another commit.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import common
+import caching
+import resources
+import streamlit as st
+from common import ROOT, import_model, load_model, parse_rows
+from features import FeatureEncoder
+from streamlit.testing.v1 import AppTest
+from synthetic_data import write_csv
+from upload_scoring import score_csv
+
+APP_FILE = os.path.join(ROOT, "app.py")
+RESULTS_FILE = os.path.join(ROOT, "benchmarks", "results.jsonl")
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "--short", "HEAD"), bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+# (name, action on the AppTest) - the same sequence for every run, so the timings are comparable
+INTERACTIONS = [
+    ("select_variable", lambda at: widget(at.selectbox, "Auswahl der Variable").select("ExitRates")),
+    ("select_variable_again", lambda at: widget(at.selectbox, "Auswahl der Variable").select("PageValues")),
+    ("slider", lambda at: at.slider[0].set_value((0.0, 50.0))),
+    ("months", lambda at: at.multiselect[0].select("November")),
+    ("slider_back", lambda at: at.slider[0].set_value((0.0, at.slider[0].max))),
+    ("variable_explanation", lambda at: widget(at.checkbox, "Klicke hier, um die Erklärung der Variablen anzuzeigen").check()),
+    ("guessing_game_submit", lambda at: at.button[0].click()),
+    ("evaluation_curve", lambda at: widget(at.selectbox, "Auswahl der Kurve").select("roc")),
+    ("guessing_game_table", lambda at: widget(at.checkbox, "Klicke hier, um die Werte für jede Person zu sehen.").check()),
+]
+
+
+def timed_run(at, timeout):
+    start = time.perf_counter()
+    at.run(timeout=timeout)
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError("app raised: {}".format(at.exception[0].message))
+    return elapsed
+
+
+def new_process():
+    # what a server restart drops: everything cached with st.cache_resource / st.cache_data
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def bench_app(data_file, timeout):
+    timings = {}
+    os.environ["APP_DATA_FILE"] = resources.DATA_FILE = data_file
+    cache_dir = tempfile.mkdtemp(prefix="bench_cache_")
+    caching.CACHE_DIR = cache_dir
+    try:
+        new_process()
+        timings["cold_start"] = timed_run(AppTest.from_file(APP_FILE, default_timeout=timeout), timeout)
+        new_process()
+        timings["warm_start"] = timed_run(AppTest.from_file(APP_FILE, default_timeout=timeout), timeout)
+        at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        timings["new_session"] = timed_run(at, timeout)
+        for name, action in INTERACTIONS:
+            action(at)
+            timings["interaction." + name] = timed_run(at, timeout)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return timings
+
+
+def bench_upload(upload_file):
+    model = load_model()
+    encoder = FeatureEncoder.from_model(model)
+    fd, out_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        score_csv(upload_file, model, encoder, out_path)
+        return time.perf_counter() - start
+    finally:
+        os.remove(out_path)
+
+
+def previous_result(path, rows, commit):
+    # last stored result for the same data size from a different commit
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                if result["rows"] == rows and result["commit"] != commit:
+                    previous = result
+    return previous
+
+
+def report(result, previous):
+    print("rows: {}  commit: {}{}".format(result["rows"], result["commit"], " (dirty)" if result["dirty"] else ""))
+    if previous is not None:
+        print("compared with commit {}".format(previous["commit"]))
+    for name, seconds in result["timings"].items():
+        line = "  {:<36} {:>10.3f} s".format(name, seconds)
+        if previous is not None and name in previous["timings"]:
+            line += "  {:>+8.1%}".format(seconds / previous["timings"][name] - 1)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless end-to-end benchmark of the web application")
+    parser.add_argument("--rows", default="12k,1M", help="comma separated data sizes, e.g. 12k,1M,10M")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds per app run")
+    parser.add_argument("--keep-data", action="store_true", help="keep the synthetic csv files")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    work_dir = tempfile.mkdtemp(prefix="bench_app_")
+    # a registry of its own with the pickled model imported
+    resources.REGISTRY_DIR = os.path.join(work_dir, "registry")
+    import_model(resources.REGISTRY_DIR)
+    try:
+        for rows in parse_rows(args.rows):
+            data_file = write_csv(os.path.join(work_dir, "synthetic_{}.csv".format(rows)), rows, args.seed)
+            upload_file = write_csv(os.path.join(work_dir, "upload_{}.csv".format(rows)), rows, args.seed + 1, upload=True)
+            timings = bench_app(data_file, args.timeout)
+            timings["upload_scoring"] = bench_upload(upload_file)
+            result = {"commit": commit, "dirty": dirty, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                      "rows": rows, "cpus": os.cpu_count(), "python": platform.python_version(),
+                      "timings": timings}
+            report(result, previous_result(args.results, rows, commit))
+            with open(args.results, "a") as f:
+                f.write(json.dumps(result) + "\n")
+            if not args.keep_data:
+                os.remove(data_file)
+                os.remove(upload_file)
+    finally:
+        if args.keep_data:
+            print("synthetic data kept in", work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#####
+
+# throughput of the offline batch scorer for 1 .. all cores
+
+#####
+
+# usage: python benchmarks/bench_batch_scoring.py [--rows 1M] [--workers 1,2,4,8] [--format parquet]
+# The scaling is only near-linear up to the number of physical cores, with
+# more workers than cores they only share the same cores.
+
+import argparse
+import os
+import tempfile
+
+from common import MODEL_FILE, parse_rows, timed
+from batch_scoring import SHARD_BYTES, score_files
+from model_registry import ModelRegistry
+from synthetic_data import write_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batch scorer")
+    parser.add_argument("--rows", default="1M")
+    parser.add_argument("--workers", default=None, help="comma separated, default: 1, 2, 4, ... up to all cores")
+    parser.add_argument("--format", default="parquet")
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+
+    cores = os.cpu_count()
+    if args.workers:
+        counts = [int(count) for count in args.workers.split(",")]
+    else:
+        counts = sorted(set([2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores] + [cores]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        registry = ModelRegistry(os.path.join(directory, "registry"))
+        registry.import_pickle(MODEL_FILE, activate=True)
+        input_path = os.path.join(directory, "sessions.csv")
+        write_csv(input_path, parse_rows(args.rows)[0], upload=True)
+        print("{} cores, {:.0f} MB input".format(cores, os.path.getsize(input_path) / 1e6))
+        print("{:>8} {:>11} {:>10} {:>12} {:>9}".format("workers", "partitions", "time [s]", "rows/s", "speedup"))
+        baseline = None
+        for workers in counts:
+            out_dir = os.path.join(directory, "out_{}".format(workers))
+            seconds, manifest = timed(score_files, [input_path], out_dir, workers, args.format,
+                                      registry_dir=registry.directory, shard_bytes=int(args.shard_mb * 1024 * 1024))
+            rate = manifest["rows"] / seconds
+            baseline = baseline or rate
+            print("{:>8} {:>11} {:>10.2f} {:>12.0f} {:>8.2f}x".format(
+                workers, len(manifest["partitions"]), seconds, rate, rate / baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#####
+
+# computation time and disk size of the stored TreeSHAP contributions
+
+#####
+
+# usage: python benchmarks/bench_contributions.py [--rows 12k,1M] [--exact-limit 12k]
+# exact TreeSHAP of the deep trees takes hours for 1M rows on few cores, above
+# --exact-limit it is measured on the first --estimate-rows rows and extrapolated.
+
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from common import DATA_FILE, enlarge, load_model, parse_rows, timed
+from contributions import compute_contributions, load_contributions, mean_abs_contributions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the contribution store")
+    parser.add_argument("--rows", default="12k,1M")
+    parser.add_argument("--exact-limit", default="12k")
+    parser.add_argument("--estimate-rows", type=int, default=2000)
+    args = parser.parse_args()
+    exact_limit = parse_rows(args.exact_limit)[0]
+
+    model = load_model()
+    reference = pd.read_csv(DATA_FILE)
+    print("{:>10} {:>12} {:>12} {:>11} {:>16}".format("rows", "mode", "time [s]", "size [MB]", "importance [s]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in parse_rows(args.rows):
+            data = reference if rows <= len(reference) else enlarge(reference, rows)
+            for approximate in (True, False):
+                path = os.path.join(directory, "contrib.npy")
+                mode = "approximate" if approximate else "exact"
+                if approximate or len(data) <= exact_limit:
+                    seconds, _ = timed(compute_contributions, model, data, path, approximate=approximate)
+                else:
+                    seconds, _ = timed(compute_contributions, model, data.iloc[:args.estimate_rows], path)
+                    seconds *= len(data) / args.estimate_rows
+                    mode += " (est.)"
+                    # size of the full matrix (features + bias, float32), the file only holds the estimate rows
+                    n_columns = len(model.get_booster().feature_names) + 1
+                    print("{:>10} {:>12} {:>12.1f} {:>11.1f} {:>16}".format(
+                        len(data), mode, seconds, len(data) * n_columns * 4 / 1e6, "-"))
+                    continue
+                importance_seconds, _ = timed(mean_abs_contributions, load_contributions(path))
+                print("{:>10} {:>12} {:>12.1f} {:>11.1f} {:>16.3f}".format(
+                    len(data), mode, seconds, os.path.getsize(path) / 1e6, importance_seconds))
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
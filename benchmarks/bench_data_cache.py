@@ -0,0 +1,60 @@
+#####
+
+# benchmark: start-up cost of pd.read_csv vs. the memory-mapped dataset cache
+
+#####
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import DATA_FILE, enlarge, timed
+import caching
+from data_cache import load_dataset
+
+
+def read_csv(path):
+    return pd.read_csv(path).dropna()
+
+
+def load_cached(path):
+    # like a new process: the fingerprint of the csv has to be computed again
+    caching._fingerprints.clear()
+    return load_dataset(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--factor", type=int, default=100, help="size of the synthetic file relative to the real one")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_FILE)
+    with tempfile.TemporaryDirectory() as directory:
+        big_file = os.path.join(directory, "online_shoppers_x{}.csv".format(args.factor))
+        enlarge(data, len(data) * args.factor).to_csv(big_file, index=False)
+
+        print("{:>12} {:>10} {:>14} {:>16} {:>16} {:>14} {:>15}".format(
+            "file", "rows", "read_csv [s]", "cache build [s]", "cache load [s]", "read_csv [MB]", "cache [MB]"))
+        for name, path in (("real", DATA_FILE), ("x{}".format(args.factor), big_file)):
+            csv_time, frame = timed(read_csv, path, repeat=3)
+            original_cache_dir = caching.CACHE_DIR
+            caching.CACHE_DIR = os.path.join(directory, "cache_" + name)
+            try:
+                # the first call builds the cache, the following ones only map it
+                build_time, _ = timed(load_cached, path)
+                load_time, cached = timed(load_cached, path, repeat=3)
+            finally:
+                caching.CACHE_DIR = original_cache_dir
+            # the cache holds float32 (or exact integer) columns, the values the model works with
+            assert list(cached.columns) == list(frame.columns)
+            assert np.array_equal(cached.to_numpy(dtype=np.float32), frame.to_numpy(dtype=np.float32))
+            print("{:>12} {:>10} {:>14.4f} {:>16.4f} {:>16.4f} {:>14.1f} {:>15.1f}".format(
+                name, len(frame), csv_time, build_time, load_time,
+                frame.memory_usage().sum() / 1e6, cached.memory_usage().sum() / 1e6))
+
+
+if __name__ == "__main__":
+    main()
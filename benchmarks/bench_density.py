@@ -0,0 +1,51 @@
+#####
+
+# benchmark: seaborn kde displot vs. cached binned KDE curves
+
+#####
+
+import argparse
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+from common import DATA_FILE, enlarge, parse_rows, timed
+from density import density_table, plot_density
+
+
+def seaborn_plot(data, variable):
+    grid = sns.displot(x=data[variable], height=3.5, hue=data["Revenue"], kind="kde", palette="Set2")
+    grid.figure.canvas.draw()
+    plt.close(grid.figure)
+
+
+def cached_plot(table, variable):
+    fig = plot_density(*table[variable], variable)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="12k,1M,10M")
+    parser.add_argument("--variable", default="ExitRates")
+    parser.add_argument("--skip-seaborn-above", default="1M", help="seaborn is too slow for larger sizes")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_FILE)
+    limit = parse_rows(args.skip_seaborn_above)[0]
+    print("{:>10} {:>16} {:>18} {:>18}".format("rows", "seaborn [s]", "all curves [s]", "switch var [s]"))
+    for rows in parse_rows(args.rows):
+        frame = enlarge(data, rows)
+        seaborn_time = timed(seaborn_plot, frame, args.variable)[0] if rows <= limit else float("nan")
+        # one pass at start-up, afterwards every switch only draws the cached curves
+        table_time, table = timed(density_table, frame)
+        switch_time, _ = timed(cached_plot, table, args.variable, repeat=3)
+        print("{:>10} {:>16.3f} {:>18.3f} {:>18.3f}".format(rows, seaborn_time, table_time, switch_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#####
+
+# benchmark: FeatureEncoder vs. pd.get_dummies / preprocess_data + DataFrame predict
+
+#####
+
+# usage: python benchmarks/bench_encoder.py [--rows 10k,1M,10M] [--raw] [--encode-only]
+#
+# With --raw, 10M rows need more than 6 GB of memory: the text columns of the
+# enlarged frame and the copies preprocess_data makes of it are held at once.
+
+import argparse
+
+import pandas as pd
+
+from common import RAW_FILE, UPLOAD_FILE, enlarge, load_model, parse_rows, timed
+from features import FeatureEncoder, preprocess_data
+
+
+def get_dummies_path(model, frame):
+    encoded = pd.get_dummies(frame, drop_first=True)
+    return model.predict(encoded)
+
+
+def preprocess_path(model, frame):
+    encoded = preprocess_data(frame.copy()).drop(columns="Revenue")
+    return model.predict(encoded)
+
+
+def encoder_path(model, encoder, frame):
+    return model.predict(encoder.transform(frame))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="10k,1M,10M", help="comma separated sizes, e.g. 10k,1M,10M")
+    parser.add_argument("--raw", action="store_true",
+                        help="use raw sessions (online_shoppers_intention.csv) and preprocess_data as baseline")
+    parser.add_argument("--encode-only", action="store_true", help="skip the model, time the encoding step only")
+    args = parser.parse_args()
+
+    model = load_model()
+    encoder = FeatureEncoder.from_model(model)
+    upload = pd.read_csv(RAW_FILE if args.raw else UPLOAD_FILE)
+    baseline = preprocess_path if args.raw else get_dummies_path
+
+    print("{:>10} {:>16} {:>16} {:>8}".format("rows", "baseline [s]", "encoder [s]", "speedup"))
+    for rows in parse_rows(args.rows):
+        frame = enlarge(upload, rows)
+        if args.encode_only:
+            if args.raw:
+                old, _ = timed(lambda: preprocess_data(frame.copy()).drop(columns="Revenue"), repeat=3)
+            else:
+                old, _ = timed(pd.get_dummies, frame, drop_first=True, repeat=3)
+            new, _ = timed(encoder.transform, frame, repeat=3)
+        else:
+            old, old_pred = timed(baseline, model, frame)
+            new, new_pred = timed(encoder_path, model, encoder, frame)
+            assert (old_pred == new_pred).all()
+        print("{:>10} {:>16.4f} {:>16.4f} {:>7.2f}x".format(rows, old, new, old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#####
+
+# evaluation.evaluate against calculate_lift of Trees_Forests.ipynb and sklearn's curve functions
+
+#####
+
+# usage: python benchmarks/bench_evaluation.py [--rows 12k,1M,10M] [--reference-limit 1M]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, precision_recall_curve, roc_auc_score, roc_curve
+
+from common import parse_rows, timed
+from evaluation import evaluate
+
+
+def calculate_lift(y_val, y_pred):
+    # copied from Trees_Forests.ipynb
+    aux_lift = pd.DataFrame()
+    aux_lift['true'] = y_val
+    aux_lift['predicted'] = y_pred
+    aux_lift.sort_values('predicted', ascending=False, inplace=True)
+    xval = np.arange(0.01, 1.01, 0.01)
+    lift = []
+    ratio_true_events_total = aux_lift['true'].sum() / len(aux_lift)
+    for x in xval:
+        index_xval = int(np.ceil(x * len(aux_lift)))
+        dataframe_xval = aux_lift.iloc[:index_xval, :]
+        lift_xval = dataframe_xval['true'].sum() / len(dataframe_xval)
+        lift.append(lift_xval / ratio_true_events_total)
+    return pd.DataFrame({"Lift": lift, "ProportionSample": xval})
+
+
+def sklearn_curves(labels, probabilities):
+    return (roc_curve(labels, probabilities), roc_auc_score(labels, probabilities),
+            precision_recall_curve(labels, probabilities), average_precision_score(labels, probabilities))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation curves")
+    parser.add_argument("--rows", default="12k,1M,10M")
+    parser.add_argument("--reference-limit", default="1M", help="largest size for the notebook and sklearn versions")
+    args = parser.parse_args()
+    limit = parse_rows(args.reference_limit)[0]
+
+    rng = np.random.default_rng(0)
+    print("{:>10} {:>14} {:>14} {:>12} {:>10}".format("rows", "evaluate [s]", "notebook [s]", "sklearn [s]", "max diff"))
+    for rows in parse_rows(args.rows):
+        # float32 probabilities like the model output, with many ties
+        probabilities = rng.beta(0.5, 3, rows).astype(np.float32)
+        labels = (rng.random(rows) < probabilities).astype(np.float64)
+        seconds, result = timed(evaluate, labels, probabilities)
+        notebook = sklearn = diff = "-"
+        if rows <= limit:
+            notebook_seconds, lift = timed(calculate_lift, labels, probabilities)
+            sklearn_seconds, (_, auc, _, ap) = timed(sklearn_curves, labels, probabilities)
+            notebook = "{:.3f}".format(notebook_seconds)
+            sklearn = "{:.3f}".format(sklearn_seconds)
+            # the notebook sorts ties in a different order, so only ties at the cut points can make a difference
+            diff = "{:.1e}".format(max(np.abs(lift["Lift"].to_numpy() - result["lift"]).max(),
+                                       abs(auc - result["roc_auc"]), abs(ap - result["average_precision"])))
+        print("{:>10} {:>14.3f} {:>14} {:>12} {:>10}".format(rows, seconds, notebook, sklearn, diff))
+
+
+if __name__ == "__main__":
+    main()
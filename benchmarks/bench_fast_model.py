@@ -0,0 +1,72 @@
+#####
+
+# latency and deviation of the fast (distilled) model against the full model
+
+#####
+
+# usage: python benchmarks/bench_fast_model.py [--rows 12k] [--truncated 50,100,200]
+# For comparison the full model cut to its first trees (iteration_range) is
+# measured as well. The deviations are measured on the sessions held out from
+# the distillation.
+
+import argparse
+
+import pandas as pd
+
+from common import DATA_FILE, enlarge, load_model, parse_rows, timed
+from data_cache import feature_matrix
+from fast_model import deviation, distill, holdout_rows
+from partial_dependence import partial_dependence
+
+
+class Truncated:
+    # the full model restricted to its first trees, with the interface partial_dependence needs
+    def __init__(self, model, n_trees):
+        self.model = model
+        self.n_trees = n_trees
+
+    def get_booster(self):
+        return self.model.get_booster()
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X, iteration_range=(0, self.n_trees))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fast model")
+    parser.add_argument("--rows", default="12k")
+    parser.add_argument("--truncated", default="50,100,200", help="tree counts of the truncated full model")
+    args = parser.parse_args()
+
+    model = load_model()
+    features = model.get_booster().feature_names
+    reference = pd.read_csv(DATA_FILE)
+    rows = parse_rows(args.rows)[0]
+    data = reference if rows <= len(reference) else enlarge(reference, rows)
+    matrix = feature_matrix(data, features)
+
+    # the deviation is measured on the sessions held out from the distillation, as in the app
+    holdout = holdout_rows(len(matrix))
+    distill_seconds, fast = timed(distill, model, matrix[~holdout])
+    print("{} rows, distillation {:.1f} s".format(len(data), distill_seconds))
+    variants = [("full", model, None), ("fast", fast, None)]
+    variants += [("first {} trees".format(n), model, n) for n in parse_rows(args.truncated)]
+
+    full_probability = model.predict_proba(matrix)[:, 1]
+    print("{:>16} {:>12} {:>14} {:>11} {:>12} {:>12} {:>11} {:>10}".format(
+        "model", "1 row [ms]", "11 rows* [ms]", "PD [ms]", "all rows [s]", "mean |dp|", "max |dp|", "same [%]"))
+    for name, variant, n_trees in variants:
+        scorer = variant if n_trees is None else Truncated(variant, n_trees)
+        one_row, _ = timed(scorer.predict_proba, matrix[:1], repeat=20)
+        game_rows, _ = timed(scorer.predict_proba, matrix[16:27], repeat=20)
+        dependence, _ = timed(partial_dependence, scorer, data, "PageValues", repeat=3)
+        all_rows, probability = timed(scorer.predict_proba, matrix)
+        result = deviation(full_probability[holdout], probability[holdout, 1])
+        print("{:>16} {:>12.2f} {:>14.2f} {:>11.0f} {:>12.2f} {:>12.4f} {:>11.3f} {:>10.1f}".format(
+            name, one_row * 1000, game_rows * 1000, dependence * 1000, all_rows, result["mean_abs"],
+            result["max_abs"], 100 * result["agreement"]))
+    print("* guessing game rows; deviation from the full model on the {} held out rows".format(int(holdout.sum())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#####
+
+# benchmark: boolean masks + groupby vs. FilterIndex for the pie chart counts
+
+#####
+
+import argparse
+
+import pandas as pd
+
+from common import DATA_FILE, enlarge, parse_rows, timed
+from filter_index import FilterIndex
+
+# typical widget states: (PageValues range, selected months)
+QUERIES = [((0.0, 400.0), [2, 3, 5, 6, 7, 8, 9, 10, 11, 12]),
+           ((10.0, 100.0), [11, 12]),
+           ((0.0, 5.0), [5]),
+           ((50.0, 60.0), [3, 5, 8])]
+
+
+def mask_path(data, low, high, months):
+    filtered_data = data.loc[(data["PageValues"] >= low) &
+                             (data["PageValues"] <= high) &
+                             (data["Month"].isin(months)), :]
+    return filtered_data.groupby("Revenue").size()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="12k,10M")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_FILE)
+    print("{:>10} {:>12} {:>14} {:>14} {:>9}".format("rows", "build [s]", "masks [ms]", "index [ms]", "speedup"))
+    for rows in parse_rows(args.rows):
+        frame = enlarge(data, rows)
+        build_time, index = timed(FilterIndex, frame["PageValues"].to_numpy(), frame["Month"].to_numpy(),
+                                  frame["Revenue"].to_numpy())
+        mask_time = index_time = 0.0
+        for (low, high), months in QUERIES:
+            seconds, expected = timed(mask_path, frame, low, high, months, repeat=3)
+            mask_time += seconds
+            seconds, counts = timed(index.class_counts, low, high, months, repeat=3)
+            index_time += seconds
+            assert counts == (int(expected.get(0.0, 0)), int(expected.get(1.0, 0)))
+            assert len(index.rows(low, high, months)) == sum(counts)
+        mask_time, index_time = mask_time / len(QUERIES) * 1000, index_time / len(QUERIES) * 1000
+        print("{:>10} {:>12.3f} {:>14.3f} {:>14.3f} {:>8.0f}x".format(rows, build_time, mask_time, index_time,
+                                                                     mask_time / index_time))
+
+
+if __name__ == "__main__":
+    main()
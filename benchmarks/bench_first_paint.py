@@ -0,0 +1,103 @@
+#####
+
+# cold start of the web application: time to first paint and to the complete page
+
+#####
+
+# usage: python benchmarks/bench_first_paint.py [--launcher streamlit|serve] [--delay 0,10] [--repeat 3]
+#
+# Starts the server (`streamlit run app.py` or `python serve.py`), waits for
+# its health check, waits --delay seconds (a user arriving some time after
+# the start) and opens one session over the websocket like a browser tab.
+# Measured from the moment the session is opened: the first element the app
+# sends (first paint) and the end of the first script run (complete page).
+# "cold" starts with an empty cache directory and a registry that only holds
+# the imported model (first deployment), "restart" with the cache directory
+# the cold start left behind (the usual case).
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from common import ROOT, import_model, parse_rows
+from load_app_sessions import free_port, start_server
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+SERVE_FILE = os.path.join(ROOT, "serve.py")
+
+
+async def open_session(url):
+    # seconds from the request to the first element and to the end of the script run
+    async with connect(url, subprotocols=["streamlit"], max_size=None) as connection:
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        start = time.perf_counter()
+        await connection.send(message.SerializeToString())
+        first_paint = None
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await connection.recv())
+            if first_paint is None and forward.HasField("delta") and forward.delta.HasField("new_element"):
+                first_paint = time.perf_counter() - start
+            if forward.HasField("delta") and forward.delta.new_element.WhichOneof("type") == "exception":
+                raise RuntimeError("app raised: {}".format(forward.delta.new_element.exception.message))
+            if forward.HasField("script_finished"):
+                return first_paint, time.perf_counter() - start
+
+
+def cold_start(env, launcher, delay):
+    # seconds until the server answers, first paint and complete page of the first session
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(env, port, launcher=launcher)
+    try:
+        ready = time.perf_counter() - start
+        time.sleep(delay)
+        first_paint, complete = asyncio.run(open_session("ws://127.0.0.1:{}/_stcore/stream".format(port)))
+        return ready, first_paint, complete
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first paint of the web application after a server start")
+    parser.add_argument("--launcher", default="streamlit", choices=("streamlit", "serve"))
+    parser.add_argument("--delay", default="0,10", help="seconds between server start and session")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    launcher = SERVE_FILE if args.launcher == "serve" else None
+
+    print("launcher: {}, {} cores, median of {} starts".format(args.launcher, os.cpu_count(), args.repeat))
+    print("{:>8} {:>9} {:>11} {:>16} {:>15}".format("start", "delay [s]", "server [s]", "first paint [s]",
+                                                   "complete [s]"))
+    for delay in parse_rows(args.delay):
+        for kind in ("cold", "restart"):
+            results = []
+            for _ in range(args.repeat):
+                work_dir = tempfile.mkdtemp(prefix="first_paint_")
+                env = dict(os.environ,
+                           APP_MODEL_REGISTRY=os.path.join(work_dir, "registry"),
+                           APP_CACHE_DIR=os.path.join(work_dir, "cache"))
+                try:
+                    import_model(env["APP_MODEL_REGISTRY"])
+                    if kind == "restart":
+                        # a first start fills registry and cache directory
+                        cold_start(env, launcher, 0)
+                    results.append(cold_start(env, launcher, delay))
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            ready, first_paint, complete = np.median(results, axis=0)
+            print("{:>8} {:>9} {:>11.2f} {:>16.2f} {:>15.2f}".format(kind, delay, ready, first_paint, complete))
+
+
+if __name__ == "__main__":
+    main()
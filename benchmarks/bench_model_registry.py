@@ -0,0 +1,86 @@
+#####
+
+# load time and memory of a model version: pickle against the registry formats
+
+#####
+
+# usage: python benchmarks/bench_model_registry.py [--repeat 5]
+# every load runs in a fresh process, so memory and import state do not carry over.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import MODEL_FILE, ROOT, load_model
+from model_registry import ModelRegistry
+
+SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import numpy as np, xgboost
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+
+before = rss_mb()
+start = time.perf_counter()
+if {fmt!r} == "pickle":
+    import pickle
+    with open({path!r}, "rb") as f:
+        model = pickle.load(f)
+else:
+    model = xgboost.XGBClassifier()
+    model.load_model({path!r})
+loaded = time.perf_counter()
+model.predict_proba(np.zeros((1, 18), dtype=np.float32))
+warm = time.perf_counter()
+print(json.dumps({{"load": loaded - start, "warm_up": warm - loaded, "rss_mb": rss_mb() - before}}))
+"""
+
+
+def measure(fmt, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        code = SCRIPT.format(root=ROOT, fmt=fmt, path=path)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {name: min(run[name] for run in runs) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loading pickled and registry models")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    model = load_model()
+    sample = pd.read_csv(os.path.join(ROOT, "new_shoppers.csv"))
+    expected = model.predict_proba(sample)[:, 1]
+    print("{:<8} {:>10} {:>10} {:>13} {:>11} {:>10}".format("format", "size [MB]", "load [ms]", "warm-up [ms]",
+                                                          "RSS [MB]", "same"))
+    with tempfile.TemporaryDirectory() as directory:
+        registry = ModelRegistry(directory)
+        paths = {"pickle": MODEL_FILE}
+        for fmt in ("ubj", "json"):
+            paths[fmt] = registry.model_path(registry.register(model, fmt=fmt))
+        for fmt, path in paths.items():
+            result = measure(fmt, path, args.repeat)
+            if fmt == "pickle":
+                same = "-"
+            else:
+                # the stored booster must give exactly the predictions of the pickled one
+                version = os.path.basename(os.path.dirname(path))
+                same = str(np.array_equal(registry.load(version).model.predict_proba(sample)[:, 1], expected))
+            print("{:<8} {:>10.2f} {:>10.1f} {:>13.1f} {:>11.1f} {:>10}".format(
+                fmt, os.path.getsize(path) / 1e6, result["load"] * 1000, result["warm_up"] * 1000,
+                result["rss_mb"], same))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#####
+
+# batched partial dependence against one predict call per grid value
+
+#####
+
+# usage: python benchmarks/bench_partial_dependence.py [--variable PageValues] [--samples 500,2k,10k] [--rows 12k,1M]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import DATA_FILE, enlarge, load_model, parse_rows, timed
+from partial_dependence import partial_dependence, sample_rows
+
+
+def per_grid_value(model, data, variable, grid, sample_size):
+    # the straightforward version: a copy of the sample and a predict call for every grid value
+    features = model.get_booster().feature_names
+    sample = data.iloc[sample_rows(len(data), sample_size)][features]
+    average = []
+    for value in grid:
+        changed = sample.copy()
+        changed[variable] = value
+        average.append(model.predict_proba(changed)[:, 1].mean())
+    return np.array(average)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark partial dependence curves")
+    parser.add_argument("--variable", default="PageValues")
+    parser.add_argument("--samples", default="500,2k,10k")
+    parser.add_argument("--rows", default="12k,1M", help="size of the data the sample is drawn from")
+    args = parser.parse_args()
+
+    model = load_model()
+    reference = pd.read_csv(DATA_FILE)
+    print("{:>10} {:>8} {:>12} {:>14} {:>10}".format("rows", "sample", "batch [s]", "per value [s]", "max diff"))
+    for rows in parse_rows(args.rows):
+        data = reference if rows <= len(reference) else enlarge(reference, rows)
+        for sample_size in parse_rows(args.samples):
+            batch_seconds, (grid, average, _) = timed(partial_dependence, model, data, args.variable,
+                                                      sample_size=sample_size, repeat=3)
+            loop_seconds, loop_average = timed(per_grid_value, model, data, args.variable, grid, sample_size)
+            print("{:>10} {:>8} {:>12.3f} {:>14.3f} {:>10.1e}".format(
+                len(data), sample_size, batch_seconds, loop_seconds, np.abs(average - loop_average).max()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#####
+
+# benchmark: scatter vs. binned rendering of the probability plot (time and PNG size)
+
+#####
+
+import argparse
+import io
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from common import DATA_FILE, enlarge, parse_rows, timed
+from probability_plot import plot_probability, probability_histogram
+
+
+def render(values, probabilities, variable, **kwargs):
+    # build the figure and encode it as PNG like st.pyplot does
+    fig = plot_probability(values, probabilities, variable, **kwargs)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="12k,1M,10M")
+    parser.add_argument("--variable", default="ExitRates")
+    parser.add_argument("--skip-scatter-above", default="1M", help="the scatter plot is too slow for larger sizes")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_FILE)
+    limit = parse_rows(args.skip_scatter_above)[0]
+    rng = np.random.default_rng(0)
+    print("{:>10} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "rows", "scatter [s]", "scatter PNG", "binning [s]", "binned [s]", "binned PNG"))
+    for rows in parse_rows(args.rows):
+        values = enlarge(data, rows)[args.variable].to_numpy()
+        # stand-in for the model output, the rendering cost does not depend on the values
+        probabilities = rng.random(rows)
+        if rows <= limit:
+            scatter_time, scatter_size = timed(render, values, probabilities, args.variable, scatter_limit=rows)
+        else:
+            scatter_time, scatter_size = float("nan"), 0
+        binning_time, histogram = timed(probability_histogram, values, probabilities)
+        binned_time, binned_size = timed(render, values, probabilities, args.variable, histogram=histogram, repeat=3)
+        print("{:>10} {:>12.3f} {:>11.0f}k {:>12.3f} {:>12.3f} {:>11.0f}k".format(
+            rows, scatter_time, scatter_size / 1000, binning_time, binned_time, binned_size / 1000))
+
+
+if __name__ == "__main__":
+    main()
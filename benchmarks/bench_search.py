@@ -0,0 +1,81 @@
+#####
+
+# successive halving search (search.py) against the GridSearchCV of Trees_Forests.ipynb
+
+#####
+
+# usage: python benchmarks/bench_search.py [--space tree] [--workers 4]
+# both searches run on the notebook's training split of clean_data.csv. The
+# configuration found by search.py is looked up in the exhaustive grid results
+# to see how close to the true best it is.
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+
+import common
+from common import ROOT
+from search import SPACES, TARGET, TrialStore, successive_halving
+
+CLEAN_FILE = os.path.join(ROOT, "Data", "clean_data.csv")
+
+
+def notebook_split():
+    # same splits as Trees_Forests.ipynb: final test set, then train / validation
+    data = pd.read_csv(CLEAN_FILE)
+    data, _ = train_test_split(data, test_size=0.2, random_state=1)
+    train, _ = train_test_split(data, test_size=0.2, random_state=1)
+    return train
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare search.py with GridSearchCV")
+    parser.add_argument("--space", default="tree", choices=sorted(SPACES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cv", type=int, default=5)
+    args = parser.parse_args()
+
+    train = notebook_split()
+    estimator, fixed, grid = SPACES[args.space]
+    X, y = train.drop(columns=TARGET), train[TARGET]
+
+    start = time.perf_counter()
+    # shuffled folds like search.py, so the scores of both searches are comparable
+    folds = StratifiedKFold(args.cv, shuffle=True, random_state=1)
+    grid_search = GridSearchCV(estimator(**fixed), grid, cv=folds).fit(X, y)
+    grid_seconds = time.perf_counter() - start
+    grid_scores = {tuple(sorted(p.items())): s for p, s in
+                   zip(grid_search.cv_results_["params"], grid_search.cv_results_["mean_test_score"])}
+    ranking = sorted(grid_scores.values(), reverse=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = os.path.join(directory, "train.csv")
+        train.to_csv(data_path, index=False)
+        store = TrialStore(os.path.join(directory, "trials.jsonl"))
+        found = []
+        result = successive_halving(data_path, args.space, cv=args.cv, workers=args.workers, store=store,
+                                    on_trial=lambda trial: found.append(trial))
+        resumed = successive_halving(data_path, args.space, cv=args.cv, workers=args.workers, store=store)
+
+    best = result["best_params"]
+    best_grid_score = grid_scores[tuple(sorted(best.items()))]
+    # time to best: when the finally chosen configuration finished its last trial
+    time_to_best = max(t["elapsed"] for t in found if t["params"] == best)
+    print("{} configurations, {} rows, {}-fold CV, {} workers".format(
+        len(grid_scores), len(train), args.cv, args.workers))
+    print("GridSearchCV:        {:7.1f} s, {} trials, best {} (CV accuracy {:.4f})".format(
+        grid_seconds, len(grid_scores), grid_search.best_params_, grid_search.best_score_))
+    print("successive halving:  {:7.1f} s, {} trials, best {} (CV accuracy in the grid {:.4f}, {:.4f} below the best, "
+          "rank {} of {})".format(result["seconds"], result["trained"], best, best_grid_score,
+                                  grid_search.best_score_ - best_grid_score, ranking.index(best_grid_score) + 1, len(ranking)))
+    print("time to best config: {:7.1f} s".format(time_to_best))
+    print("resumed search:      {:7.1f} s, {} trials trained, {} from the store".format(
+        resumed["seconds"], resumed["trained"], resumed["reused"]))
+
+
+if __name__ == "__main__":
+    main()
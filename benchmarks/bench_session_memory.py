@@ -0,0 +1,91 @@
+#####
+
+# memory of the app process with many concurrent sessions
+
+#####
+
+# usage: python benchmarks/bench_session_memory.py [--rows 1M] [--sessions 10,50,200]
+#
+# All sessions of a streamlit server live in one process and share everything
+# cached with st.cache_resource. Every session here is an AppTest of its own
+# (own session state, shared caches) that runs the app once and changes the
+# variable of the Daten Explorer once. The sessions are kept alive, the
+# resident memory of the process is measured after every step. The memory per
+# session is the growth since the previous step; the first sessions also
+# leave memory of the cache fills behind that the process keeps.
+
+import argparse
+import gc
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import common
+import caching
+from common import ROOT, import_model, parse_rows
+from streamlit.testing.v1 import AppTest
+from synthetic_data import write_csv
+
+APP_FILE = os.path.join(ROOT, "app.py")
+
+
+def rss_mb():
+    # current resident set size (Linux), the peak of the process elsewhere; garbage of the reruns is freed first
+    gc.collect()
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_session(timeout):
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout).run()
+    variable = [widget for widget in at.selectbox if widget.label == "Auswahl der Variable"][0]
+    variable.select("ExitRates").run()
+    if at.exception:
+        raise RuntimeError("app raised: {}".format(at.exception[0].message))
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of the app process with concurrent sessions")
+    parser.add_argument("--rows", default="1M")
+    parser.add_argument("--sessions", default="10,50,200")
+    parser.add_argument("--timeout", type=float, default=3600)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_sessions_")
+    os.environ["APP_MODEL_REGISTRY"] = os.path.join(work_dir, "registry")
+    import_model(os.environ["APP_MODEL_REGISTRY"])
+    os.environ["APP_DATA_FILE"] = write_csv(os.path.join(work_dir, "synthetic.csv"), parse_rows(args.rows)[0])
+    caching.CACHE_DIR = os.path.join(work_dir, "cache")
+    try:
+        before = rss_mb()
+        sessions = [open_session(args.timeout)]
+        print("{} rows, process before the app {:.0f} MB, with one session {:.0f} MB".format(
+            parse_rows(args.rows)[0], before, rss_mb()))
+        print("{:>9} {:>10} {:>16} {:>18} {:>13}".format("sessions", "RSS [MB]", "per session [MB]", "peak RSS [MB]",
+                                                       "time [s]"))
+        start = time.perf_counter()
+        previous = None
+        for count in sorted(parse_rows(args.sessions)):
+            while len(sessions) < count:
+                sessions.append(open_session(args.timeout))
+            rss = rss_mb()
+            per_session = "-" if previous is None else "{:.2f}".format((rss - previous[1]) / (count - previous[0]))
+            print("{:>9} {:>10.0f} {:>16} {:>18.0f} {:>13.1f}".format(
+                count, rss, per_session, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                time.perf_counter() - start))
+            previous = (count, rss)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#####
+
+# wall time and peak memory of train.py on synthetic raw data
+
+#####
+
+# usage: python benchmarks/bench_training.py [--rows 1M,10M] [--rounds 500] [--external-memory]
+# every size is trained in a separate process, so the peak RSS of one run does
+# not hide the one of the next.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, parse_rows
+from synthetic_data import write_csv
+
+SCRIPT = """
+import json, sys
+sys.path.insert(0, {root!r})
+from train import train
+model, info = train({path!r}, rounds={rounds}, external_memory={external_memory})
+print(json.dumps(info))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training pipeline")
+    parser.add_argument("--rows", default="1M,10M")
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--external-memory", action="store_true")
+    args = parser.parse_args()
+
+    print("{:>10} {:>7} {:>10} {:>10} {:>10} {:>14} {:>8}".format(
+        "rows", "rounds", "data [s]", "boost [s]", "wall [s]", "peak RSS [MB]", "AUC"))
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in parse_rows(args.rows):
+            path = write_csv(os.path.join(directory, "raw_{}.csv".format(rows)), rows, raw=True)
+            code = SCRIPT.format(root=ROOT, path=path, rounds=args.rounds, external_memory=args.external_memory)
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+            info = json.loads(output.strip().splitlines()[-1])
+            print("{:>10} {:>7} {:>10.1f} {:>10.1f} {:>10.1f} {:>14.0f} {:>8.4f}".format(
+                rows, args.rounds, info["load_seconds"], info["train_seconds"], info["wall_seconds"],
+                info["peak_rss_mb"], info["metrics"].get("roc_auc", float("nan"))))
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
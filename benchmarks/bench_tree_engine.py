@@ -0,0 +1,74 @@
+#####
+
+# benchmark: numpy TreeEngine vs. xgboost predict_proba (latency and throughput)
+
+#####
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import DATA_FILE, enlarge, load_model, parse_rows, timed
+from tree_engine import TreeEngine
+
+
+def check(engine, model, X):
+    # margins have to be exactly the ones of xgboost, also with missing values,
+    # probabilities may differ in the last float32 bits (exp of the C library)
+    X_missing = X.copy()
+    X_missing[::7, 8] = np.nan
+    X_missing[::5, 3] = np.nan
+    booster = model.get_booster()
+    for matrix in (X, X_missing):
+        margin = booster.inplace_predict(matrix, predict_type="margin")
+        if not np.array_equal(engine.predict_margin(matrix), margin):
+            raise AssertionError("TreeEngine margins differ from xgboost")
+        np.testing.assert_allclose(engine.predict_proba(matrix), model.predict_proba(matrix), rtol=1e-6)
+        np.testing.assert_array_equal(engine.predict(matrix), model.predict(matrix))
+    print("check: {} rows match xgboost (margins bitwise, probabilities within 1e-6)".format(len(X)))
+
+
+def latency(predict, row, calls):
+    # median single call latency in milliseconds
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1k,10k,100k", help="batch sizes for the throughput test")
+    parser.add_argument("--calls", type=int, default=200, help="number of calls for the latency test")
+    args = parser.parse_args()
+
+    model = load_model()
+    start = time.perf_counter()
+    engine = TreeEngine.from_model(model)
+    print("export of {} trees ({} nodes): {:.3f} s".format(engine.n_trees, len(engine.left), time.perf_counter() - start))
+
+    data = pd.read_csv(DATA_FILE).drop(columns="Revenue")
+    X = data.to_numpy(np.float32)
+    check(engine, model, X)
+
+    print("\nsingle row latency [ms]")
+    for name, row in (("ndarray", X[:1]), ("DataFrame", data.iloc[:1])):
+        print("  {:<10} engine {:8.3f}   xgboost {:8.3f}".format(
+            name, latency(engine.predict_proba, row, args.calls), latency(model.predict_proba, row, args.calls)))
+    print("  11 rows    engine {:8.3f}   xgboost {:8.3f}".format(
+        latency(engine.predict_proba, X[16:27], args.calls), latency(model.predict_proba, X[16:27], args.calls)))
+
+    print("\n{:>10} {:>18} {:>18}".format("rows", "engine [rows/s]", "xgboost [rows/s]"))
+    for rows in parse_rows(args.rows):
+        batch = enlarge(data, rows).to_numpy(np.float32)
+        engine_time, _ = timed(engine.predict_proba, batch)
+        xgboost_time, _ = timed(model.predict_proba, batch)
+        print("{:>10} {:>18,.0f} {:>18,.0f}".format(rows, rows / engine_time, rows / xgboost_time))
+
+
+if __name__ == "__main__":
+    main()
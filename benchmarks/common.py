@@ -0,0 +1,58 @@
+#####
+
+# shared helpers for the benchmark scripts
+
+#####
+
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_FILE = os.path.join(ROOT, "online_shoppers_app_dev.csv")
+UPLOAD_FILE = os.path.join(ROOT, "new_shoppers.csv")
+RAW_FILE = os.path.join(ROOT, "Data", "online_shoppers_intention.csv")
+MODEL_FILE = os.path.join(ROOT, "finalized_default_model.sav")
+
+
+def load_model():
+    with open(MODEL_FILE, "rb") as f:
+        return pickle.load(f)
+
+
+def import_model(registry_dir):
+    # the app only reads the registry, the pickled model is taken over offline like in a deployment
+    from model_registry import ModelRegistry
+
+    return ModelRegistry(registry_dir).import_pickle(MODEL_FILE, DATA_FILE, activate=True)
+
+
+def enlarge(frame, rows, seed=0):
+    # sample rows with replacement to get a frame of the wanted size
+    index = np.random.default_rng(seed).integers(0, len(frame), rows)
+    return frame.iloc[index].reset_index(drop=True)
+
+
+def timed(function, *args, repeat=1, **kwargs):
+    # best wall time in seconds over ``repeat`` runs and the last result
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def parse_rows(text):
+    # "10k,1M,10M" -> [10000, 1000000, 10000000]
+    factors = {"k": 1000, "m": 1000000}
+    rows = []
+    for item in text.split(","):
+        item = item.strip().lower()
+        rows.append(int(float(item[:-1]) * factors[item[-1]]) if item[-1] in factors else int(item))
+    return rows
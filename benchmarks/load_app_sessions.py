@@ -0,0 +1,200 @@
+#####
+
+# load test of the web application: N concurrent browser sessions replaying widget interactions
+
+#####
+
+# usage: python benchmarks/load_app_sessions.py [--rows 12k] [--sessions 1,2,4,8,16] [--threads 4 --workers 2]
+#
+# Starts `streamlit run app.py` on synthetic data and connects N clients to
+# its websocket, each one a session of its own like a browser tab. A client
+# speaks the protocol of the streamlit frontend: it sends the widget states
+# with every rerun request, widgets inside a fragment only rerun their
+# fragment. After one warm-up session all N sessions open the app at the same
+# time and replay INTERACTIONS, the time from the request to the end of the
+# rerun is measured. Reported per number of sessions: rerun latency
+# percentiles, reruns per second and the CPU use of the server process
+# relative to all cores (read from /proc, Linux only).
+# --threads/--workers set the thread budget of the shared inference executor
+# (APP_INFERENCE_THREADS/APP_INFERENCE_WORKERS).
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from common import ROOT, import_model, parse_rows
+from synthetic_data import write_csv
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_FILE = os.path.join(ROOT, "app.py")
+WIDGETS = ("selectbox", "slider", "multiselect", "checkbox", "button", "radio")
+
+# (name, widget type, label, value) - the interactions of bench_app.py, as the frontend sends them
+INTERACTIONS = [
+    ("select_variable", "selectbox", "Auswahl der Variable", "ExitRates"),
+    ("select_variable_again", "selectbox", "Auswahl der Variable", "PageValues"),
+    ("slider", "slider", "Page-Value", (0.0, 50.0)),
+    ("months", "multiselect", "Monat der Session", ["November"]),
+    ("slider_back", "slider", "Page-Value", None),
+    ("variable_explanation", "checkbox", "Klicke hier, um die Erklärung der Variablen anzuzeigen", True),
+    ("guessing_game_submit", "button", "Submit", True),
+    ("evaluation_curve", "selectbox", "Auswahl der Kurve", "ROC"),
+    ("guessing_game_table", "checkbox", "Klicke hier, um die Werte für jede Person zu sehen.", True),
+]
+
+
+class Session:
+    """One browser session: the widgets of the page and their current states."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.widgets = {}
+        self.states = {}
+
+    async def rerun(self, fragment_id=""):
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.fragment_id = fragment_id
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        start = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        # triggers (buttons) are only sent once, like in the frontend
+        self.states = {key: state for key, state in self.states.items() if not state.HasField("trigger_value")}
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.connection.recv())
+            if forward.HasField("script_finished"):
+                return time.perf_counter() - start
+            if forward.HasField("delta") and forward.delta.HasField("new_element"):
+                element = forward.delta.new_element
+                kind = element.WhichOneof("type")
+                if kind == "exception":
+                    raise RuntimeError("app raised: {}".format(element.exception.message))
+                if kind in WIDGETS:
+                    widget = getattr(element, kind)
+                    self.widgets[(kind, widget.label)] = (widget, forward.delta.fragment_id)
+
+    async def interact(self, kind, label, value):
+        widget, fragment_id = self.widgets[(kind, label)]
+        state = WidgetState(id=widget.id)
+        if kind == "selectbox":
+            state.string_value = value
+        elif kind == "slider":
+            state.double_array_value.data[:] = value if value is not None else (widget.min, widget.max)
+        elif kind == "multiselect":
+            state.string_array_value.data[:] = value
+        elif kind == "checkbox":
+            state.bool_value = value
+        elif kind == "button":
+            state.trigger_value = value
+        self.states[widget.id] = state
+        return await self.rerun(fragment_id)
+
+
+async def run_session(url, start, latencies):
+    async with connect(url, subprotocols=["streamlit"], max_size=None) as connection:
+        session = Session(connection)
+        await start.wait()
+        latencies.append(("open", await session.rerun()))
+        for name, kind, label, value in INTERACTIONS:
+            latencies.append((name, await session.interact(kind, label, value)))
+
+
+def cpu_seconds(pid):
+    # user + system time of a process
+    with open("/proc/{}/stat".format(pid)) as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def load_test(url, sessions, pid):
+    latencies = []
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(run_session(url, start, latencies)) for _ in range(sessions)]
+    # all sessions are connected before the clock starts
+    await asyncio.sleep(0.5)
+    wall_start, cpu_start = time.perf_counter(), cpu_seconds(pid)
+    start.set()
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - wall_start, cpu_seconds(pid) - cpu_start
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(env, port, timeout=120, launcher=None):
+    # `streamlit run app.py`, or a launcher script taking the streamlit options (serve.py)
+    command = [sys.executable, launcher] if launcher else [sys.executable, "-m", "streamlit", "run", APP_FILE]
+    server = subprocess.Popen(command + ["--server.headless", "true", "--server.port", str(port),
+                                         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+                              env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen("http://127.0.0.1:{}/_stcore/health".format(port), timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit did not start within {} s".format(timeout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web application with concurrent sessions")
+    parser.add_argument("--rows", default="12k", help="size of the synthetic data")
+    parser.add_argument("--sessions", default="1,2,4,8,16")
+    parser.add_argument("--threads", type=int, default=None, help="APP_INFERENCE_THREADS")
+    parser.add_argument("--workers", type=int, default=None, help="APP_INFERENCE_WORKERS")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="load_app_")
+    env = dict(os.environ,
+               APP_DATA_FILE=write_csv(os.path.join(work_dir, "synthetic.csv"), parse_rows(args.rows)[0]),
+               APP_MODEL_REGISTRY=os.path.join(work_dir, "registry"),
+               APP_CACHE_DIR=os.path.join(work_dir, "cache"))
+    import_model(env["APP_MODEL_REGISTRY"])
+    if args.threads is not None:
+        env["APP_INFERENCE_THREADS"] = str(args.threads)
+    if args.workers is not None:
+        env["APP_INFERENCE_WORKERS"] = str(args.workers)
+    port = free_port()
+    url = "ws://127.0.0.1:{}/_stcore/stream".format(port)
+    server = start_server(env, port)
+    try:
+        # fills the shared caches of the server, the sessions below only measure reruns
+        asyncio.run(load_test(url, 1, server.pid))
+        cores = os.cpu_count()
+        print("{} rows, {} cores, {} reruns per session".format(parse_rows(args.rows)[0], cores, 1 + len(INTERACTIONS)))
+        print("{:>9} {:>7} {:>9} {:>9} {:>9} {:>9} {:>10} {:>8}".format(
+            "sessions", "reruns", "p50 [ms]", "p90 [ms]", "p99 [ms]", "max [ms]", "reruns/s", "CPU [%]"))
+        for sessions in parse_rows(args.sessions):
+            latencies, wall, cpu = asyncio.run(load_test(url, sessions, server.pid))
+            milliseconds = np.array([seconds for _, seconds in latencies]) * 1000
+            p50, p90, p99 = np.percentile(milliseconds, [50, 90, 99])
+            print("{:>9} {:>7} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.0f} {:>10.2f} {:>8.0f}".format(
+                sessions, len(milliseconds), p50, p90, p99, milliseconds.max(), len(milliseconds) / wall,
+                100 * cpu / wall / cores))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
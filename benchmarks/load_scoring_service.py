@@ -0,0 +1,104 @@
+#####
+
+# load generator for scoring_service.py: micro-batching vs. one request one predict
+
+#####
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import ROOT, UPLOAD_FILE
+
+
+async def request(reader, writer, method, path, body=b""):
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n".format(
+        method, path, len(body)).encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, bodies, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for body in bodies:
+        start = time.perf_counter()
+        status, _ = await request(reader, writer, "POST", "/predict", body)
+        if status != 200:
+            raise RuntimeError("request failed with status {}".format(status))
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run_load(port, sessions, concurrency, requests):
+    bodies = [json.dumps(sessions[i % len(sessions)]).encode("utf-8") for i in range(requests)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, bodies[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, metrics = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+    latencies = np.asarray(latencies) * 1000
+    return {"throughput_rps": requests / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "mean_batch_size": metrics["mean_batch_size"]}
+
+
+def start_service(port, max_batch_size, max_wait_ms, workers):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "scoring_service.py"), "--port", str(port),
+         "--max-batch-size", str(max_batch_size), "--max-wait-ms", str(max_wait_ms), "--workers", str(workers)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    # the service prints one line as soon as it accepts connections
+    process.stdout.readline()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=32, help="number of parallel clients")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    sessions = pd.read_csv(UPLOAD_FILE).to_dict(orient="records")
+    modes = (("one request one predict", 1, 0.0), ("micro-batching", args.max_batch_size, args.max_wait_ms))
+
+    print("{} requests from {} clients, sessions from new_shoppers.csv\n".format(args.requests, args.concurrency))
+    print("{:<25} {:>12} {:>10} {:>10} {:>11}".format("mode", "requests/s", "p50 [ms]", "p99 [ms]", "mean batch"))
+    results = {}
+    for name, max_batch_size, max_wait_ms in modes:
+        process = start_service(args.port, max_batch_size, max_wait_ms, args.workers)
+        try:
+            result = asyncio.run(run_load(args.port, sessions, args.concurrency, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+        results[name] = result
+        print("{:<25} {:>12.0f} {:>10.1f} {:>10.1f} {:>11.1f}".format(
+            name, result["throughput_rps"], result["p50_ms"], result["p99_ms"], result["mean_batch_size"]))
+    gain = results["micro-batching"]["throughput_rps"] / results["one request one predict"]["throughput_rps"]
+    print("\nthroughput gain of micro-batching: {:.1f}x".format(gain))
+
+
+if __name__ == "__main__":
+    main()
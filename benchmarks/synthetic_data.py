@@ -0,0 +1,65 @@
+#####
+
+# synthetic online shopper sessions in the schema of online_shoppers_app_dev.csv
+
+#####
+
+# usage: python benchmarks/synthetic_data.py --rows 1M --out synthetic_1M.csv [--upload | --raw]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import DATA_FILE, RAW_FILE, parse_rows
+
+# columns with continuous values, these are jittered so that the synthetic rows are not plain copies
+CONTINUOUS = ["Administrative_Duration", "Informational_Duration", "ProductRelated_Duration",
+              "BounceRates", "ExitRates", "PageValues"]
+RATES = ["BounceRates", "ExitRates"]
+
+
+def generate(rows, seed=0, chunk_size=500000, template=None):
+    """Yield DataFrames with ``rows`` synthetic sessions in total.
+
+    Whole sessions of the reference data are resampled, so the marginals and
+    the dependencies between columns (e.g. PageValues and Revenue) stay
+    realistic. Non-zero continuous values get a multiplicative log-normal
+    jitter of about 10 %, rates stay within [0, 0.2] like in the real data.
+    """
+    template = pd.read_csv(DATA_FILE) if template is None else template
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_size):
+        size = min(chunk_size, rows - start)
+        chunk = template.iloc[rng.integers(0, len(template), size)].reset_index(drop=True)
+        for column in CONTINUOUS:
+            values = chunk[column].to_numpy()
+            chunk[column] = values * rng.lognormal(0, 0.1, size)
+        chunk[RATES] = chunk[RATES].clip(0, 0.2)
+        yield chunk
+
+
+def write_csv(path, rows, seed=0, upload=False, raw=False):
+    # upload files have no Revenue column, like new_shoppers.csv
+    # raw files are in the format of online_shoppers_intention.csv (month names, booleans, ...)
+    template = pd.read_csv(RAW_FILE if raw else DATA_FILE)
+    for i, chunk in enumerate(generate(rows, seed, template=template)):
+        if upload:
+            chunk = chunk.drop(columns="Revenue")
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic shopper sessions to a csv file")
+    parser.add_argument("--rows", default="12k")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--upload", action="store_true", help="leave out the Revenue column")
+    parser.add_argument("--raw", action="store_true", help="format of online_shoppers_intention.csv")
+    args = parser.parse_args()
+    write_csv(args.out, parse_rows(args.rows)[0], args.seed, args.upload, args.raw)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#####
+
+# helpers for the on-disk caches of the web application
+
+#####
+
+import hashlib
+import os
+
+# every derived artefact (probabilities, binary data copies, ...) lives here; APP_CACHE_DIR selects another directory
+CACHE_DIR = os.environ.get("APP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+_fingerprints = {}
+
+
+def file_fingerprint(*paths, chunk_size=1 << 20):
+    """Return a sha256 hex digest over the content of all given files.
+
+    The digest of a file is remembered together with its size and mtime, so
+    asking again for an unchanged file only costs one ``os.stat`` call.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in _fingerprints:
+            file_digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    file_digest.update(chunk)
+            _fingerprints[key] = file_digest.hexdigest()
+        digest.update(_fingerprints[key].encode("ascii"))
+    return digest.hexdigest()
+
+
+def cache_path(name):
+    # path inside the cache directory, the directory is created on demand
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
@@ -0,0 +1,192 @@
+#####
+
+# TreeSHAP feature contributions, stored as float32 .npy files that are read memory-mapped
+
+#####
+
+# usage: python contributions.py [--data online_shoppers_app_dev.csv] [--approximate] [--batch-size 5000]
+#
+# Computes the contributions of the reference data for the live model version
+# of the registry. They are stored in the cache directory under the fingerprint
+# of model file and data file, the app reads them from there. Exact TreeSHAP of
+# the deep trees (max_depth=20) is slow, about 30 ms per session and core, so
+# this runs offline; --approximate uses the much faster Saabas approximation.
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from caching import cache_path, file_fingerprint
+
+# rows per pred_contribs call, bounds the memory of one batch (xgboost uses all cores within a batch)
+BATCH_SIZE = 5000
+
+
+def contribution_columns(feature_names):
+    # one column per feature plus the bias (expected margin), in the order of pred_contribs
+    return list(feature_names) + ["bias"]
+
+
+def predict_contributions(model, matrix, approximate=False):
+    """Contributions of every feature to the margin (log-odds) of every row, float32.
+
+    The contributions of a row plus its bias add up to the margin of the model.
+    The thread setting of the model is used, it is fixed when the model is
+    loaded (``ModelRegistry.load(..., nthread=...)``) and never changed here,
+    the booster may be shared by several sessions.
+    """
+    import xgboost
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    dmatrix = xgboost.DMatrix(matrix, feature_names=booster.feature_names)
+    return booster.predict(dmatrix, pred_contribs=True, approx_contribs=approximate).astype(np.float32, copy=False)
+
+
+class ContributionWriter:
+    """Write a float32 ``.npy`` matrix block by block, without knowing the number of rows in advance.
+
+    The npy header is padded to 64 bytes, so the header for the final number
+    of rows has the same size as the one written at the start and can simply
+    be written over it when the file is closed. The file only appears under
+    ``path`` once it is complete.
+    """
+
+    def __init__(self, path, n_columns):
+        self.path = path
+        self.n_columns = n_columns
+        self.rows = 0
+        self.tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        self.file = open(self.tmp_path, "wb")
+        self._write_header()
+        self.header_size = self.file.tell()
+
+    def _write_header(self):
+        self.file.seek(0)
+        np.lib.format.write_array_header_1_0(self.file, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                                                         "fortran_order": False,
+                                                         "shape": (self.rows, self.n_columns)})
+
+    def write(self, block):
+        block = np.ascontiguousarray(block, dtype=np.float32)
+        if block.ndim != 2 or block.shape[1] != self.n_columns:
+            raise ValueError("expected blocks with {} columns, got shape {}".format(self.n_columns, block.shape))
+        self.file.write(block.tobytes())
+        self.rows += len(block)
+
+    def close(self):
+        end = self.file.tell()
+        self._write_header()
+        if self.file.tell() != self.header_size:
+            raise RuntimeError("npy header changed its size")
+        self.file.seek(end)
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def reference_path(model_path, data_path, approximate=False):
+    # contributions of the reference data, keyed by the content of model and data
+    return cache_path("contrib_{}{}.npy".format(file_fingerprint(model_path, data_path)[:16],
+                                                "_approx" if approximate else ""))
+
+
+def compute_contributions(model, data, path, batch_size=BATCH_SIZE, approximate=False, on_batch=None):
+    """Compute the contributions of all rows of ``data`` batch by batch into ``path``.
+
+    Only one batch is in memory at a time. ``on_batch(rows)`` is called
+    after every batch with the number of finished rows.
+    """
+    features = model.get_booster().feature_names
+    with ContributionWriter(path, len(features) + 1) as writer:
+        for start in range(0, len(data), batch_size):
+            batch = data.iloc[start:start + batch_size][features].to_numpy(dtype=np.float32)
+            writer.write(predict_contributions(model, batch, approximate))
+            if on_batch is not None:
+                on_batch(writer.rows)
+    return path
+
+
+def load_contributions(path):
+    # read-only memory map, None if the contributions were not computed yet
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def mean_abs_contributions(contributions, batch_rows=1 << 18):
+    # global importance: mean absolute contribution of every column, read batch by batch from the memory map
+    total = np.zeros(contributions.shape[1], dtype=np.float64)
+    for start in range(0, len(contributions), batch_rows):
+        total += np.abs(contributions[start:start + batch_rows]).sum(axis=0, dtype=np.float64)
+    return total / max(len(contributions), 1)
+
+
+def plot_importance(importance, feature_names, title="Wichtigkeit der Variablen"):
+    # like plot_variable_importance in Trees_Forests.ipynb, without the bias column
+    import matplotlib.pyplot as plt
+
+    order = np.argsort(importance[:len(feature_names)])
+    fig, ax = plt.subplots(figsize=(10, 7))
+    ax.barh(np.asarray(feature_names)[order], importance[order], color="green")
+    ax.set_xlabel("Mittlerer absoluter SHAP-Wert (Log-Odds)")
+    ax.set_title(title)
+    ax.grid(axis="x")
+    ax.set_facecolor("#f5f5fa")
+    return fig
+
+
+def plot_explanation(contribution, values, feature_names, top=8):
+    """Bar chart of the largest contributions for one session, red pushes towards a transaction."""
+    import matplotlib.pyplot as plt
+
+    contribution = np.asarray(contribution[:len(feature_names)])
+    order = np.argsort(np.abs(contribution))[-top:]
+    labels = ["{} = {:g}".format(feature_names[i], values[i]) for i in order]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(labels, contribution[order], color=np.where(contribution[order] > 0, "tomato", "#4169E1"))
+    ax.axvline(0, color="grey")
+    ax.set_xlabel("Beitrag zur Vorhersage (Log-Odds)")
+    ax.grid(axis="x")
+    ax.set_facecolor("#f5f5fa")
+    return fig
+
+
+def main():
+    from data_cache import load_dataset
+    from model_registry import LiveModels, ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Compute the contributions of the reference data")
+    parser.add_argument("--data", default=os.environ.get("APP_DATA_FILE", "online_shoppers_app_dev.csv"))
+    parser.add_argument("--approximate", action="store_true", help="Saabas approximation instead of exact TreeSHAP")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--nthread", type=int, default=None, help="default: all cores")
+    args = parser.parse_args()
+
+    live_model = LiveModels(ModelRegistry(), nthread=args.nthread).current()
+    data = load_dataset(args.data)
+    path = reference_path(live_model.path, args.data, args.approximate)
+    start = time.perf_counter()
+
+    def progress(rows):
+        print("{} / {} rows, {:.1f} s".format(rows, len(data), time.perf_counter() - start), flush=True)
+
+    compute_contributions(live_model.model, data, path, args.batch_size, args.approximate, progress)
+    print("written to {} ({:.1f} MB)".format(path, os.path.getsize(path) / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#####
+
+# binary, memory-mapped copy of the app dataset with compact column types
+
+#####
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from caching import cache_path, file_fingerprint
+
+
+INTEGER_TYPES = (np.int8, np.int16, np.int32)
+
+
+def compact_dtype(values):
+    """Smallest type that holds ``values``: int8/int16/int32 for whole numbers, float32 otherwise.
+
+    Dummies, Weekend, Revenue, Month and the codes (OperatingSystems, Browser,
+    Region, TrafficType) become int8. Other columns become float32, the
+    precision xgboost works with, so the model sees the same values as before.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) and np.all(values == np.round(values)):
+        low, high = values.min(), values.max()
+        for dtype in INTEGER_TYPES:
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+    return np.dtype(np.float32)
+
+
+def build_dataset_cache(csv_path, directory):
+    # parse the csv once and store every column as its own .npy file in its compact type
+    data = pd.read_csv(csv_path).dropna()
+    tmp_directory = "{}.{}.tmp".format(directory, os.getpid())
+    os.makedirs(tmp_directory, exist_ok=True)
+    columns = []
+    for i, column in enumerate(data.columns):
+        values = data[column].to_numpy(dtype=np.float64)
+        dtype = compact_dtype(values)
+        np.save(os.path.join(tmp_directory, "{}.npy".format(i)), values.astype(dtype))
+        columns.append({"name": column, "dtype": dtype.name})
+    with open(os.path.join(tmp_directory, "columns.json"), "w") as f:
+        json.dump(columns, f)
+    # another process may have built the same cache in the meantime, both copies are identical
+    try:
+        os.rename(tmp_directory, directory)
+    except OSError:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def load_dataset(csv_path):
+    """Return the dataset of ``csv_path`` as a read-only, memory-mapped DataFrame.
+
+    On first use the csv is parsed and written to the cache directory, keyed
+    by the fingerprint of its content. Later calls (also from new processes)
+    map the stored columns without parsing or copying them. Every column of
+    the DataFrame is a view of its mapped file, so all sessions and processes
+    share the same pages of the page cache. Use ``feature_matrix`` to get the
+    input of the model.
+    """
+    directory = cache_path("dataset_{}".format(file_fingerprint(csv_path)[:16]))
+    if not os.path.exists(os.path.join(directory, "columns.json")):
+        build_dataset_cache(csv_path, directory)
+    with open(os.path.join(directory, "columns.json")) as f:
+        columns = json.load(f)
+    return pd.DataFrame({column["name"]: np.load(os.path.join(directory, "{}.npy".format(i)), mmap_mode="r")
+                         for i, column in enumerate(columns)}, copy=False)
+
+
+def feature_matrix(data, feature_names):
+    # float32 matrix in the column order of the model, the only copy of the data made for a prediction
+    return data[list(feature_names)].to_numpy(dtype=np.float32)
+
+
+def load_table(excel_path):
+    """Return a small Excel table (e.g. Variable_Explanation.xlsx), read from a binary copy after the first use.
+
+    Reading the xlsx needs openpyxl and takes a large part of a second; the
+    Arrow (feather) copy in the cache directory is read in milliseconds.
+    """
+    path = cache_path("table_{}.feather".format(file_fingerprint(excel_path)[:16]))
+    if os.path.exists(path):
+        return pd.read_feather(path)
+    table = pd.read_excel(excel_path)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    table.to_feather(tmp_path)
+    os.replace(tmp_path, path)
+    return table
@@ -0,0 +1,171 @@
+#####
+
+# model evaluation curves (lift, gains, ROC, precision-recall, calibration) from one sort
+
+#####
+
+import os
+
+import numpy as np
+
+from caching import cache_path
+
+# number of sample proportions of the lift and gains curves (0.01, 0.02, ..., 1.00 as in calculate_lift)
+POINTS = 100
+# ROC and PR curves are thinned out to at most this many points for plotting
+MAX_CURVE_POINTS = 2000
+CALIBRATION_BINS = 10
+
+CURVES = {"lift": "Lift", "gains": "Kumulative Gains", "roc": "ROC", "pr": "Precision-Recall",
+          "calibration": "Kalibrierung"}
+
+
+def _thin(index, max_points):
+    # evenly spaced subset of the curve points, first and last point are kept
+    if len(index) <= max_points:
+        return index
+    return index[np.unique(np.linspace(0, len(index) - 1, max_points).round().astype(np.int64))]
+
+
+def evaluate(labels, probabilities, points=POINTS, calibration_bins=CALIBRATION_BINS, max_curve_points=MAX_CURVE_POINTS):
+    """Compute all evaluation curves and summary metrics of a binary classifier.
+
+    The sessions are sorted by probability once. Cumulative sums of the
+    sorted labels give the true and false positives for every threshold, and
+    all curves are read off them. Sessions with equal probability share one
+    threshold, so ties are handled like in sklearn. The calibration curve
+    only needs ``np.bincount``. Returns a dict of numpy arrays and floats.
+    """
+    labels = np.asarray(labels) == 1
+    # + 0.0 turns -0.0 into 0.0, its sign bit would break the sort key below
+    probabilities = np.asarray(probabilities, dtype=np.float64) + 0.0
+    if not probabilities.min() >= 0:
+        raise ValueError("probabilities must be between 0 and 1 and must not be NaN")
+    n = len(labels)
+    positives = int(labels.sum())
+    negatives = n - positives
+
+    # the bits of a non-negative float64 sort like the value and the sign bit is free, so the label fits
+    # into the lowest bit of a uint64 key: sorting the keys is much faster than an argsort and a gather
+    keys = (probabilities.view(np.uint64) << np.uint64(1)) | labels.astype(np.uint64)
+    keys.sort()
+    keys = keys[::-1]
+    true_positives = np.cumsum(keys & np.uint64(1), dtype=np.int64)
+    # last session of every group of equal probabilities, i.e. every distinct threshold
+    sorted_bits = keys >> np.uint64(1)
+    thresholds = np.r_[np.flatnonzero(sorted_bits[1:] != sorted_bits[:-1]), n - 1]
+    del keys, sorted_bits
+    tp = true_positives[thresholds]
+    fp = thresholds + 1 - tp
+
+    # ROC, area by the trapezoidal rule over all thresholds
+    tpr = np.r_[0, tp / max(positives, 1)]
+    fpr = np.r_[0, fp / max(negatives, 1)]
+    roc_auc = float(np.trapezoid(tpr, fpr))
+
+    # precision-recall, average precision as in sklearn (step function, no interpolation)
+    precision = tp / (tp + fp)
+    recall = tp / max(positives, 1)
+    average_precision = float(np.sum(np.diff(np.r_[0, recall]) * precision))
+
+    # lift and cumulative gains at fixed proportions of the sample, like calculate_lift in Trees_Forests.ipynb
+    proportions = np.arange(1, points + 1) / points
+    top = np.ceil(proportions * n).astype(np.int64)
+    found = true_positives[top - 1]
+    base_rate = positives / n
+    lift = found / top / base_rate if base_rate else np.full(points, np.nan)
+    gains = found / max(positives, 1)
+
+    # calibration: mean probability against observed revenue rate per probability bin
+    bins = np.clip((probabilities * calibration_bins).astype(np.int64), 0, calibration_bins - 1)
+    counts = np.bincount(bins, minlength=calibration_bins)
+    filled = counts > 0
+    mean_probability = np.bincount(bins, weights=probabilities, minlength=calibration_bins)[filled] / counts[filled]
+    revenue_rate = np.bincount(bins, weights=labels, minlength=calibration_bins)[filled] / counts[filled]
+
+    # classification report numbers at the 0.5 threshold of model.predict
+    predicted = probabilities > 0.5
+    tp_05 = int(np.count_nonzero(predicted & labels))
+    fp_05 = int(np.count_nonzero(predicted)) - tp_05
+    fn_05 = positives - tp_05
+    precision_05 = tp_05 / (tp_05 + fp_05) if tp_05 + fp_05 else 0.0
+    recall_05 = tp_05 / positives if positives else 0.0
+
+    keep = _thin(np.arange(len(thresholds)), max_curve_points)
+    return {"sessions": n,
+            "positives": positives,
+            "roc_auc": roc_auc,
+            "average_precision": average_precision,
+            "accuracy": (n - fp_05 - fn_05) / n,
+            "precision": precision_05,
+            "recall": recall_05,
+            "f1": 2 * precision_05 * recall_05 / (precision_05 + recall_05) if precision_05 + recall_05 else 0.0,
+            "proportions": proportions,
+            "lift": lift,
+            "gains": gains,
+            "fpr": np.r_[0, fpr[1:][keep]],
+            "tpr": np.r_[0, tpr[1:][keep]],
+            "precision_curve": precision[keep],
+            "recall_curve": recall[keep],
+            "calibration_probability": mean_probability,
+            "calibration_rate": revenue_rate,
+            "calibration_count": counts[filled]}
+
+
+def load_evaluation(fingerprint, labels, probabilities):
+    """Return ``evaluate(labels, probabilities)``, stored on disk under ``fingerprint``.
+
+    ``fingerprint`` must identify model and data (e.g. ``file_fingerprint(model_path, data_path)``).
+    """
+    path = cache_path("evaluation_{}.npz".format(fingerprint[:16]))
+    if os.path.exists(path):
+        with np.load(path) as stored:
+            return {name: stored[name] if stored[name].ndim else stored[name].item() for name in stored.files}
+    result = evaluate(labels, probabilities)
+    # np.savez adds .npz to names without it, so the temporary file keeps the extension
+    tmp_path = "{}.{}.tmp.npz".format(path[:-4], os.getpid())
+    np.savez(tmp_path, **result)
+    os.replace(tmp_path, path)
+    return result
+
+
+def plot_curve(result, kind):
+    # one of the CURVES, styled like the lift curves of Trees_Forests.ipynb
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if kind == "lift":
+        ax.plot(result["proportions"], result["lift"], color="red", linewidth=3, label="Boosting")
+        ax.plot([0, 1], [1, 1], color="grey", label="Baseline")
+        ax.set_xlabel("Proportion of sample")
+        ax.set_ylabel("Lift")
+    elif kind == "gains":
+        ax.plot(np.r_[0, result["proportions"]], np.r_[0, result["gains"]], color="red", linewidth=3, label="Boosting")
+        ax.plot([0, 1], [0, 1], color="grey", label="Baseline")
+        ax.set_xlabel("Proportion of sample")
+        ax.set_ylabel("Anteil gefundener Transaktionen")
+    elif kind == "roc":
+        ax.plot(result["fpr"], result["tpr"], color="red", linewidth=3,
+                label="Boosting (AUC = {:.3f})".format(result["roc_auc"]))
+        ax.plot([0, 1], [0, 1], color="grey", label="Baseline")
+        ax.set_xlabel("False Positive Rate")
+        ax.set_ylabel("True Positive Rate")
+    elif kind == "pr":
+        ax.plot(result["recall_curve"], result["precision_curve"], color="red", linewidth=3,
+                label="Boosting (AP = {:.3f})".format(result["average_precision"]))
+        ax.plot([0, 1], [result["positives"] / result["sessions"]] * 2, color="grey", label="Baseline")
+        ax.set_xlabel("Recall")
+        ax.set_ylabel("Precision")
+    elif kind == "calibration":
+        ax.plot(result["calibration_probability"], result["calibration_rate"], color="red", linewidth=3,
+                marker="o", label="Boosting")
+        ax.plot([0, 1], [0, 1], color="grey", label="Perfekt kalibriert")
+        ax.set_xlabel("Vorhergesagte Wahrscheinlichkeit")
+        ax.set_ylabel("Beobachteter Anteil mit Transaktion")
+    else:
+        raise ValueError("unknown curve {!r}, expected one of {}".format(kind, ", ".join(CURVES)))
+    ax.set_title(CURVES[kind])
+    ax.grid()
+    ax.set_facecolor("#f5f5fa")
+    ax.legend()
+    return fig
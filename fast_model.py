@@ -0,0 +1,93 @@
+#####
+
+# fast mode: a small model distilled from the full revenue model
+
+#####
+
+# The full model (500 trees of depth up to 20) is more than the interactive
+# parts of the app need. The fast model is a small xgboost model (100 trees of
+# depth 6) trained on the probabilities of the full model instead of the
+# labels, so it learns to reproduce the full model rather than the data. Next
+# to the reference sessions it also learns from a copy with every column
+# shuffled on its own: partial dependence scores sessions with values changed
+# one at a time, which are not in the reference data either.
+# A fixed random fifth of the reference sessions is held out from the
+# distillation, the deviation from the full model is measured on them.
+# It is built on first use and stored in the cache directory under the
+# fingerprint of the full model and the data.
+
+import os
+
+import numpy as np
+import xgboost
+
+from caching import cache_path, file_fingerprint
+from data_cache import feature_matrix
+
+FAST_TREES = 100
+FAST_DEPTH = 6
+# reference sessions the fast model is trained on at most, larger datasets are sampled
+DISTILL_ROWS = 50000
+# share of the reference sessions held out from the distillation
+HOLDOUT = 0.2
+
+
+def holdout_rows(n_rows, holdout=HOLDOUT, seed=0):
+    # boolean mask of the held out sessions, the same on every call
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[np.random.default_rng(seed).permutation(n_rows)[:int(round(n_rows * holdout))]] = True
+    return mask
+
+
+def distill(model, matrix, n_estimators=FAST_TREES, max_depth=FAST_DEPTH, seed=0, nthread=None):
+    """Train a small ``XGBClassifier`` that reproduces the probabilities of ``model`` on ``matrix``.
+
+    ``matrix`` is a float32 matrix in the feature order of ``model``.
+    """
+    rng = np.random.default_rng(seed)
+    if len(matrix) > DISTILL_ROWS:
+        matrix = matrix[np.sort(rng.choice(len(matrix), DISTILL_ROWS, replace=False))]
+    shuffled = np.column_stack([rng.permutation(matrix[:, j]) for j in range(matrix.shape[1])])
+    inputs = np.vstack([matrix, shuffled])
+    # binary:logistic accepts probabilities as labels
+    labels = model.predict_proba(inputs)[:, 1]
+    params = {"objective": "binary:logistic", "max_depth": max_depth, "eta": 0.1, "tree_method": "hist",
+              "seed": seed}
+    if nthread is not None:
+        params["nthread"] = nthread
+    feature_names = model.get_booster().feature_names
+    booster = xgboost.train(params, xgboost.DMatrix(inputs, label=labels, feature_names=feature_names), n_estimators)
+    fast = xgboost.XGBClassifier()
+    fast.load_model(bytearray(booster.save_raw("json")))
+    return fast
+
+
+def load_fast_model(model, data, model_path, data_path, nthread=None):
+    """Return the fast model of ``model``, distilled on ``data`` on first use and then read from the cache.
+
+    The sessions of ``holdout_rows(len(data))`` are left out of the distillation.
+    """
+    path = cache_path("fast_{}_holdout{:.0f}.ubj".format(file_fingerprint(model_path, data_path)[:16], HOLDOUT * 100))
+    if not os.path.exists(path):
+        matrix = feature_matrix(data, model.get_booster().feature_names)
+        fast = distill(model, matrix[~holdout_rows(len(matrix))], nthread=nthread)
+        # the extension tells xgboost the format, so the temporary file keeps it
+        tmp_path = "{}.{}.tmp.ubj".format(path[:-4], os.getpid())
+        fast.save_model(tmp_path)
+        os.replace(tmp_path, path)
+    fast = xgboost.XGBClassifier()
+    fast.load_model(path)
+    if nthread is not None:
+        fast.set_params(n_jobs=nthread)
+    return fast
+
+
+def deviation(full, fast, threshold=0.5):
+    # how far the probabilities and decisions of the fast model are from those of the full model
+    difference = np.abs(np.asarray(fast, dtype=np.float64) - np.asarray(full, dtype=np.float64))
+    same = (np.asarray(full) > threshold) == (np.asarray(fast) > threshold)
+    return {"sessions": len(difference),
+            "mean_abs": float(difference.mean()),
+            "max_abs": float(difference.max()),
+            "agreement": float(same.mean()),
+            "changed": int(len(same) - same.sum())}
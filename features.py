@@ -0,0 +1,148 @@
+#####
+
+# schema-locked feature encoding for the revenue model
+
+#####
+
+import numpy as np
+import pandas as pd
+
+# same mappings as preprocess_data in best_model_complete_notebook.ipynb
+MONTHS = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "June": 6,
+          "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
+VISITOR_TYPES = {"Other": "Different"}
+
+
+def preprocess_data(df):
+    # data preprocessing and cleaning in one step, as in best_model_complete_notebook.ipynb
+    df["Weekend"] = df["Weekend"].astype(float)
+    df["Revenue"] = df["Revenue"].astype(float)
+    df["Month"] = df["Month"].replace(MONTHS).astype(float)
+    df["VisitorType"] = df["VisitorType"].replace(VISITOR_TYPES)
+    df = pd.get_dummies(df, drop_first=True).astype(float)
+    return df
+
+
+# categorical columns that are one-hot encoded, the first level is dropped (drop_first=True)
+CATEGORIES = {"VisitorType": ["Different", "New_Visitor", "Returning_Visitor"]}
+
+
+class FeatureEncoder:
+    """Turn raw or already dummy-encoded session rows into the model matrix.
+
+    The column order is taken from the model and never changes, no matter
+    which categories appear in the data. Raw rows (``Month`` as "Feb",
+    ``VisitorType`` as text, booleans) and rows in the format of
+    ``online_shoppers_app_dev.csv`` are both accepted.
+
+    Categories that were not seen in training are handled according to
+    ``handle_unknown``: ``"missing"`` encodes them as NaN, so the trees follow
+    their learned default direction, ``"error"`` raises a ``ValueError``.
+    """
+
+    def __init__(self, feature_names, categories=None, handle_unknown="missing"):
+        if handle_unknown not in ("missing", "error"):
+            raise ValueError("handle_unknown must be 'missing' or 'error', got {!r}".format(handle_unknown))
+        self.feature_names = list(feature_names)
+        self.categories = dict(CATEGORIES if categories is None else categories)
+        self.handle_unknown = handle_unknown
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        return cls(model.get_booster().feature_names, **kwargs)
+
+    @classmethod
+    def fit(cls, raw, feature_names=None, **kwargs):
+        """Learn the category levels from raw training data.
+
+        Without ``feature_names`` the column order is the one that
+        ``preprocess_data`` produces for ``raw`` (without ``Revenue``).
+        """
+        categories = {}
+        for column in CATEGORIES:
+            values = raw[column].replace(VISITOR_TYPES) if column == "VisitorType" else raw[column]
+            categories[column] = sorted(str(value) for value in values.dropna().unique())
+        if feature_names is None:
+            feature_names = cls._feature_names(raw.columns, categories)
+        return cls(feature_names, categories=categories, **kwargs)
+
+    @classmethod
+    def from_columns(cls, columns, **kwargs):
+        """Encoder for raw data with the given columns and the fixed training categories.
+
+        Needs only the header of a raw file, so the columns are known before
+        any data is read (e.g. when the data is streamed in chunks).
+        """
+        return cls(cls._feature_names(columns, CATEGORIES), **kwargs)
+
+    @staticmethod
+    def _feature_names(columns, categories):
+        # like pd.get_dummies: plain columns first, dummy columns appended at the end
+        feature_names = [column for column in columns if column != "Revenue" and column not in categories]
+        for column, levels in categories.items():
+            feature_names += ["{}_{}".format(column, level) for level in levels[1:]]
+        return feature_names
+
+    def transform(self, frame):
+        """Return a C-contiguous float32 matrix with one column per model feature."""
+        missing = self.missing_columns(frame.columns)
+        if missing:
+            raise ValueError("Missing columns in data: {}".format(", ".join(missing)))
+
+        # columns are filled one by one into a column-major buffer, which is faster than strided writes
+        matrix = np.empty((len(frame), len(self.feature_names)), dtype=np.float32, order="F")
+        codes = {}
+        for j, name in enumerate(self.feature_names):
+            if name in frame.columns:
+                matrix[:, j] = self._numeric(frame[name], name)
+                continue
+            # one-hot column built from the raw categorical column
+            column = self._category_of(name)
+            if column not in codes:
+                codes[column] = self._codes(frame[column], column)
+            level = self.categories[column].index(name[len(column) + 1:])
+            matrix[:, j] = codes[column] == level
+            matrix[codes[column] < 0, j] = np.nan
+        return np.ascontiguousarray(matrix)
+
+    def transform_frame(self, frame):
+        # same as transform, but keeps the column names and the index
+        return pd.DataFrame(self.transform(frame), columns=self.feature_names, index=frame.index)
+
+    def missing_columns(self, columns):
+        # model features that can neither be read directly nor built from a categorical column
+        return [name for name in self.feature_names
+                if name not in columns and self._category_of(name) not in columns]
+
+    def _category_of(self, name):
+        for column in self.categories:
+            if name.startswith(column + "_"):
+                return column
+        return None
+
+    def _numeric(self, values, name):
+        if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+            return values.to_numpy(dtype=np.float32, na_value=np.nan)
+        if name == "Month":
+            return self._lookup(values, MONTHS, name)
+        # text booleans such as "TRUE"/"FALSE" if the csv reader did not convert them
+        return self._lookup(values, {"TRUE": 1.0, "FALSE": 0.0, "True": 1.0, "False": 0.0}, name)
+
+    def _codes(self, values, column):
+        # position of each value in the known levels, -1 for unknown values
+        levels = {level: i for i, level in enumerate(self.categories[column])}
+        if column == "VisitorType":
+            levels.update({raw: levels[level] for raw, level in VISITOR_TYPES.items() if level in levels})
+        codes = self._lookup(values, levels, column)
+        return np.where(np.isnan(codes), -1, codes).astype(np.int8)
+
+    def _lookup(self, values, mapping, column):
+        # map the few distinct values once and broadcast the result to all rows
+        codes, uniques = pd.factorize(values)
+        table = np.array([mapping.get(value, np.nan) for value in uniques] + [np.nan], dtype=np.float32)
+        unknown = [value for value in uniques if value not in mapping]
+        if self.handle_unknown == "error" and unknown:
+            raise ValueError("Unknown values in column {}: {}".format(
+                column, ", ".join(map(str, unknown[:10]))))
+        # code -1 (missing value) picks the trailing NaN of the table
+        return table[codes]
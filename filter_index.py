@@ -0,0 +1,58 @@
+#####
+
+# precomputed index for the PageValues / month filter of the Daten Explorer
+
+#####
+
+import numpy as np
+
+
+class FilterIndex:
+    """Answer "how many sessions with and without revenue" for a filter without scanning the data.
+
+    The rows are sorted by PageValues once (``order`` is the permutation).
+    For every month the sorted PageValues of its rows and the cumulative
+    number of revenue sessions along them are stored. A query for a
+    PageValues range and a set of months then needs two ``searchsorted``
+    calls and two lookups in the prefix sums per month, independent of the
+    number of rows.
+    """
+
+    def __init__(self, page_values, months, revenue):
+        page_values = np.asarray(page_values, dtype=np.float64)
+        self.order = np.argsort(page_values, kind="stable")
+        self.sorted_values = page_values[self.order]
+        # month of every row in sorted order, used when the filtered rows themselves are needed
+        self.months = np.unique(months)
+        self.sorted_month_codes = np.searchsorted(self.months, np.asarray(months)[self.order]).astype(np.int8)
+
+        sorted_revenue = np.asarray(revenue)[self.order] == 1
+        self.month_values = {}
+        self.month_revenue = {}
+        for code, month in enumerate(self.months):
+            in_month = self.sorted_month_codes == code
+            self.month_values[month] = self.sorted_values[in_month]
+            # prefix sums with a leading zero: revenue sessions among the first i rows of the month
+            self.month_revenue[month] = np.concatenate([[0], np.cumsum(sorted_revenue[in_month])])
+
+    def class_counts(self, low, high, months):
+        """Return ``(no_revenue, revenue)`` for low <= PageValues <= high and the given months."""
+        total = 0
+        revenue = 0
+        for month in months:
+            values = self.month_values.get(month)
+            if values is None:
+                continue
+            start = np.searchsorted(values, low, side="left")
+            stop = np.searchsorted(values, high, side="right")
+            if stop > start:
+                total += stop - start
+                revenue += self.month_revenue[month][stop] - self.month_revenue[month][start]
+        return int(total - revenue), int(revenue)
+
+    def rows(self, low, high, months):
+        # positions of the matching rows in the original data, in order of PageValues
+        start = np.searchsorted(self.sorted_values, low, side="left")
+        stop = np.searchsorted(self.sorted_values, high, side="right")
+        selected = np.isin(self.months, list(months))
+        return self.order[start:stop][selected[self.sorted_month_codes[start:stop]]]
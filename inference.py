@@ -0,0 +1,131 @@
+#####
+
+# shared inference executor: the predictions of all sessions on a fixed thread budget
+
+#####
+
+# Streamlit runs every session in a thread of its own. If every session calls
+# predict_proba of the shared model with xgboost's default (all cores), a few
+# concurrent sessions start cores x sessions threads and the latency of every
+# single rerun becomes unpredictable. Instead all predictions are submitted to
+# one executor: at most ``workers`` predictions run at the same time, each one
+# with ``threads // workers`` xgboost threads, so inference never uses more
+# than ``threads`` cores. Further requests wait in the queue of the executor.
+#
+# The wrapped model only hands out a read-only view of its booster: feature
+# names and the serialized model, and predict (TreeSHAP contributions) runs in
+# the executor as well. Longer jobs on the model, e.g. distilling the fast
+# model, are submitted with ``run``.
+#
+# APP_INFERENCE_THREADS   thread budget of all predictions (default: all cores)
+# APP_INFERENCE_WORKERS   predictions running at the same time (default: 1)
+
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+import numpy as np
+
+INFERENCE_THREADS = int(os.environ.get("APP_INFERENCE_THREADS", 0)) or os.cpu_count()
+INFERENCE_WORKERS = int(os.environ.get("APP_INFERENCE_WORKERS", 1))
+
+
+class InferenceExecutor:
+    """Run predictions of all sessions with a fixed budget of threads.
+
+    ``nthread`` is the number of xgboost threads a model should use. It is
+    set once when a model is loaded (``LiveModels(..., nthread=...)``), not
+    while the model is shared between threads. ``run`` executes a function
+    in the executor and waits for its result, the times spent waiting in the
+    queue and running are kept for ``stats``.
+    """
+
+    def __init__(self, threads=INFERENCE_THREADS, workers=INFERENCE_WORKERS, window=10000):
+        self.threads = max(threads or os.cpu_count(), 1)
+        self.workers = min(max(workers, 1), self.threads)
+        self.nthread = max(self.threads // self.workers, 1)
+        self.executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="inference")
+        self.lock = threading.Lock()
+        self.waits = collections.deque(maxlen=window)
+        self.runs = collections.deque(maxlen=window)
+
+    def run(self, function, *args, **kwargs):
+        submitted = time.perf_counter()
+        timing = {}
+
+        def job():
+            timing["start"] = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timing["end"] = time.perf_counter()
+
+        try:
+            return self.executor.submit(job).result()
+        finally:
+            if "start" in timing:
+                with self.lock:
+                    self.waits.append(timing["start"] - submitted)
+                    self.runs.append(timing["end"] - timing["start"])
+
+    def wrap(self, model):
+        return SharedModel(model, self)
+
+    def stats(self):
+        # number of predictions and percentiles of their queue and run times in milliseconds
+        with self.lock:
+            waits = np.asarray(self.waits) * 1000
+            runs = np.asarray(self.runs) * 1000
+        if not len(runs):
+            return {"predictions": 0}
+        wait_percentiles = np.percentile(waits, [50, 99])
+        run_percentiles = np.percentile(runs, [50, 99])
+        return {"predictions": len(runs),
+                "wait_p50_ms": wait_percentiles[0],
+                "wait_p99_ms": wait_percentiles[1],
+                "run_p50_ms": run_percentiles[0],
+                "run_p99_ms": run_percentiles[1]}
+
+
+class SharedModel:
+    """A model whose predictions run in an ``InferenceExecutor``, everything else is passed through."""
+
+    def __init__(self, model, executor):
+        self.model = model
+        self.executor = executor
+
+    def predict_proba(self, X, **kwargs):
+        return self.executor.run(self.model.predict_proba, X, **kwargs)
+
+    def predict(self, X, **kwargs):
+        return self.executor.run(self.model.predict, X, **kwargs)
+
+    def get_booster(self):
+        return SharedBooster(self.model.get_booster(), self.executor)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class SharedBooster:
+    """Read-only view of a shared booster, its predictions run in an ``InferenceExecutor``.
+
+    Parameters such as ``nthread`` cannot be changed through it: the booster is
+    used by all sessions at the same time.
+    """
+
+    def __init__(self, booster, executor):
+        self.booster = booster
+        self.executor = executor
+
+    @property
+    def feature_names(self):
+        return self.booster.feature_names
+
+    def save_raw(self, raw_format="ubj"):
+        return self.booster.save_raw(raw_format)
+
+    def predict(self, data, **kwargs):
+        return self.executor.run(self.booster.predict, data, **kwargs)
@@ -0,0 +1,268 @@
+#####
+
+# model registry: versioned boosters in xgboost's own format, warm loading and hot-swap
+
+#####
+
+# usage: python model_registry.py list
+#        python model_registry.py import finalized_default_model.sav --data online_shoppers_app_dev.csv [--activate]
+#        python model_registry.py activate <version>
+#        python model_registry.py compare <version> <version> new_shoppers.csv
+#
+# Every version is a directory models/registry/<version>/ with the booster
+# (model.ubj or model.json, no pickle) and metadata.json (feature order,
+# training data fingerprint, metrics, ...). The file CURRENT names the active
+# version. Writing a version or switching CURRENT is atomic (rename), so a
+# server reading the registry never sees a half written state.
+# Pickles are only read by the offline `import` command: the app, the scoring
+# service and batch scoring load the boosters from the registry, so a new
+# model goes live by importing (or registering) and activating it here.
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost
+
+from caching import file_fingerprint
+
+# APP_MODEL_REGISTRY selects another registry, e.g. for benchmarks
+REGISTRY_DIR = os.environ.get("APP_MODEL_REGISTRY",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "registry"))
+FORMATS = ("ubj", "json")
+
+
+class ModelRegistry:
+    """Versions of the revenue model stored on disk."""
+
+    def __init__(self, directory=REGISTRY_DIR):
+        self.directory = directory
+
+    def register(self, model, data_fingerprint=None, metrics=None, fmt="ubj", activate=False, **extra):
+        """Store a booster (or ``XGBClassifier``) as a new version and return the version name.
+
+        The version is the registration time plus the beginning of the hash
+        of the stored model, ``extra`` is added to the metadata as it is.
+        """
+        if fmt not in FORMATS:
+            raise ValueError("format must be one of {}, got {!r}".format(", ".join(FORMATS), fmt))
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        if not booster.feature_names:
+            raise ValueError("the booster has no feature names, the feature order could not be checked on loading")
+        raw = bytes(booster.save_raw("ubj" if fmt == "ubj" else "json"))
+        model_hash = hashlib.sha256(raw).hexdigest()
+        version = "{}_{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), model_hash[:8])
+        metadata = dict(extra,
+                        version=version,
+                        file="model.{}".format(fmt),
+                        model_sha256=model_hash,
+                        feature_names=list(booster.feature_names),
+                        n_trees=booster.num_boosted_rounds(),
+                        data_fingerprint=data_fingerprint,
+                        metrics=metrics or {},
+                        created=datetime.datetime.now().isoformat(timespec="seconds"),
+                        xgboost_version=xgboost.__version__)
+
+        # the version directory appears complete or not at all
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.directory)
+        try:
+            with open(os.path.join(tmp_dir, metadata["file"]), "wb") as f:
+                f.write(raw)
+            with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(tmp_dir, os.path.join(self.directory, version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def import_pickle(self, model_path, data_path=None, **kwargs):
+        # one-time migration of a pickled XGBClassifier (like finalized_default_model.sav)
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        return self.register(model, data_fingerprint=file_fingerprint(data_path) if data_path else None,
+                             source=os.path.abspath(model_path), source_fingerprint=file_fingerprint(model_path),
+                             **kwargs)
+
+    def versions(self):
+        # all registered versions, oldest first
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(os.path.join(self.directory, name, "metadata.json")))
+
+    def metadata(self, version):
+        with open(os.path.join(self.directory, version, "metadata.json")) as f:
+            return json.load(f)
+
+    def model_path(self, version):
+        return os.path.join(self.directory, version, self.metadata(version)["file"])
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError("unknown model version {!r}".format(version))
+        tmp_path = os.path.join(self.directory, "CURRENT.{}.tmp".format(os.getpid()))
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.directory, "CURRENT"))
+
+    def load(self, version, warm=True, nthread=None):
+        """Load a version as ``LoadedModel``, by default with one dummy prediction to warm it up.
+
+        ``nthread`` fixes the threads of every prediction, by default xgboost uses all cores.
+        """
+        metadata = self.metadata(version)
+        path = os.path.join(self.directory, version, metadata["file"])
+        model = xgboost.XGBClassifier()
+        model.load_model(path)
+        if nthread is not None:
+            model.set_params(n_jobs=nthread)
+        if model.get_booster().feature_names != metadata["feature_names"]:
+            raise ValueError("feature order of model {} does not match its metadata".format(version))
+        if warm:
+            model.predict_proba(np.zeros((1, len(metadata["feature_names"])), dtype=np.float32))
+        return LoadedModel(version, model, metadata, path)
+
+
+LoadedModel = collections.namedtuple("LoadedModel", ["version", "model", "metadata", "path"])
+
+
+class LiveModels:
+    """The loaded model versions of a server process, shared by all sessions.
+
+    ``current()`` returns the live version. ``refresh()`` notices a newly
+    activated version in the registry and loads and warms it in a background
+    thread. Only when it is ready it replaces the live version with one
+    reference assignment, so requests keep using the old version until then
+    and never wait for a load. Up to ``keep`` versions stay loaded, e.g. for
+    scoring the same data with the live and a candidate version side by side.
+    All versions are loaded with ``nthread`` xgboost threads.
+    """
+
+    def __init__(self, registry, keep=2, nthread=None):
+        self.registry = registry
+        self.keep = max(keep, 1)
+        self.nthread = nthread
+        self.loaded = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="model-loader")
+        self.pending = None
+        self.live = None
+
+    def get(self, version):
+        # loaded version, loaded right away if it is not in memory yet
+        with self.lock:
+            loaded = self.loaded.get(version)
+            if loaded is not None:
+                self.loaded.move_to_end(version)
+                return loaded
+        loaded = self.registry.load(version, nthread=self.nthread)
+        with self.lock:
+            self.loaded[version] = loaded
+            self.loaded.move_to_end(version)
+            # the live version and the one just loaded are never dropped
+            droppable = [name for name in self.loaded
+                         if name != version and (self.live is None or name != self.live.version)]
+            while len(self.loaded) > self.keep and droppable:
+                del self.loaded[droppable.pop(0)]
+        return loaded
+
+    def switch(self, version):
+        self.live = self.get(version)
+        return self.live
+
+    def switch_in_background(self, version):
+        with self.lock:
+            if self.pending is not None and not self.pending.done():
+                return self.pending
+            self.pending = self.executor.submit(self.switch, version)
+            return self.pending
+
+    def current(self):
+        if self.live is None:
+            version = self.registry.active_version()
+            if version is None:
+                raise LookupError("no active model version in {}".format(self.registry.directory))
+            self.switch(version)
+        return self.live
+
+    def refresh(self):
+        # cheap enough for every rerun: one small file read
+        version = self.registry.active_version()
+        if version is not None and (self.live is None or version != self.live.version):
+            return self.switch_in_background(version)
+        return None
+
+    def score(self, frame, versions):
+        """Revenue probabilities of ``frame`` (model matrix) for several versions, one column per version."""
+        return pd.DataFrame({version: self.get(version).model.predict_proba(frame)[:, 1] for version in versions},
+                            index=frame.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the versions of the revenue model")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    import_parser = commands.add_parser("import", help="take over a pickled model")
+    import_parser.add_argument("model")
+    import_parser.add_argument("--data", default=None, help="training data, its fingerprint is stored")
+    import_parser.add_argument("--format", default="ubj", choices=FORMATS)
+    import_parser.add_argument("--activate", action="store_true")
+    activate_parser = commands.add_parser("activate")
+    activate_parser.add_argument("version")
+    compare_parser = commands.add_parser("compare", help="score a csv file with two versions")
+    compare_parser.add_argument("versions", nargs=2)
+    compare_parser.add_argument("data")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "list":
+        active = registry.active_version()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            print("{} {}  {} trees, data {}, metrics {}".format(
+                "*" if version == active else " ", version, metadata["n_trees"],
+                (metadata["data_fingerprint"] or "-")[:8], metadata["metrics"]))
+    elif args.command == "import":
+        print(registry.import_pickle(args.model, args.data, fmt=args.format, activate=args.activate))
+    elif args.command == "activate":
+        registry.activate(args.version)
+    elif args.command == "compare":
+        from features import FeatureEncoder
+
+        live = LiveModels(registry)
+        start = time.perf_counter()
+        encoder = FeatureEncoder(registry.metadata(args.versions[0])["feature_names"])
+        frame = pd.read_csv(args.data)
+        matrix = pd.DataFrame(encoder.transform(frame), columns=encoder.feature_names)
+        scores = live.score(matrix, args.versions)
+        first, second = scores[args.versions[0]], scores[args.versions[1]]
+        print("{} sessions in {:.2f} s".format(len(scores), time.perf_counter() - start))
+        print("same prediction: {:.2%}, mean |difference of probability|: {:.4f}".format(
+            ((first > 0.5) == (second > 0.5)).mean(), (first - second).abs().mean()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#####
+
+# partial dependence and ICE curves of the revenue model, scored as one batch
+
+#####
+
+import numpy as np
+
+# number of values of the variable the curves are evaluated at
+GRID_SIZE = 20
+# sessions the curves are averaged over, larger datasets are sampled
+SAMPLE_SIZE = 2000
+# single ICE curves drawn in the plot
+ICE_LINES = 100
+
+
+def sample_rows(n_rows, sample_size=SAMPLE_SIZE, seed=0):
+    # fixed random subset of the row positions (all rows for small data), sorted for cache friendly access
+    if n_rows <= sample_size:
+        return np.arange(n_rows)
+    return np.sort(np.random.default_rng(seed).choice(n_rows, sample_size, replace=False))
+
+
+def value_grid(values, grid_size=GRID_SIZE, percentiles=(0.05, 0.95)):
+    """Grid of values for one variable, as in sklearn's partial_dependence.
+
+    Variables with at most ``grid_size`` distinct values (Month, Weekend,
+    Region, ...) use exactly these values, all others an evenly spaced grid
+    between the 5 % and 95 % quantile, so a few extreme sessions do not
+    stretch the grid.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    distinct = np.unique(values)
+    if len(distinct) <= grid_size:
+        return distinct
+    low, high = np.quantile(values, percentiles)
+    if low == high:
+        return distinct[[0, -1]]
+    return np.linspace(low, high, grid_size)
+
+
+def partial_dependence(model, data, variable, grid=None, grid_size=GRID_SIZE, sample_size=SAMPLE_SIZE, seed=0):
+    """Return ``(grid, average, ice)`` for ``variable``.
+
+    For a sample of sessions every grid value is put into the column of
+    ``variable`` while all other columns keep their values. All grid values
+    of all sessions form one batch that is scored with a single
+    ``predict_proba`` call. ``ice`` has one row of probabilities per sampled
+    session, ``average`` (the partial dependence) is its mean over sessions.
+    """
+    features = model.get_booster().feature_names
+    rows = sample_rows(len(data), sample_size, seed)
+    # only the sampled rows are copied, not the whole (possibly memory-mapped) data
+    sample = data.iloc[rows][features].to_numpy(dtype=np.float32)
+    if grid is None:
+        grid = value_grid(sample[:, features.index(variable)], grid_size)
+    grid = np.asarray(grid, dtype=np.float64)
+
+    # batch layout: grid value after grid value, each block holds all sampled sessions
+    batch = np.tile(sample, (len(grid), 1))
+    batch[:, features.index(variable)] = np.repeat(grid.astype(np.float32), len(sample))
+    probabilities = model.predict_proba(batch)[:, 1].reshape(len(grid), len(sample))
+    ice = np.ascontiguousarray(probabilities.T)
+    return grid, ice.mean(axis=0), ice
+
+
+def plot_partial_dependence(grid, average, ice, variable, ice_lines=ICE_LINES):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    # a fixed subset of the ICE curves, all of them would only give a grey area
+    for curve in ice[np.linspace(0, len(ice) - 1, min(ice_lines, len(ice))).astype(np.int64)]:
+        ax.plot(grid, curve, color="#4d4d4d", alpha=0.15, linewidth=1)
+    ax.plot([], [], color="#4d4d4d", alpha=0.5, label="ICE (einzelne Sessions)")
+    ax.plot(grid, average, color="tomato", linewidth=3, marker="o", label="Partial Dependence (Mittelwert)")
+    ax.set_xlabel(variable, fontsize=15)
+    ax.set_ylabel("Wahrscheinlichkeit einer Transaktion", fontsize=15)
+    ax.set_ylim(-0.02, 1.02)
+    ax.grid()
+    ax.set_facecolor("#f5f5fa")
+    ax.legend()
+    return fig
@@ -0,0 +1,64 @@
+#####
+
+# probability-vs-variable plot, drawn as scatter or as binned 2d histogram
+
+#####
+
+import numpy as np
+
+# up to this many sessions every session is drawn as a point
+SCATTER_LIMIT = 50000
+# number of bins along the variable and along the probability
+BINS = (80, 50)
+
+
+def probability_histogram(values, probabilities, bins=BINS):
+    """Count the sessions per cell of a fixed (variable, probability) grid.
+
+    Returns ``(counts, x_edges, y_edges)``. The probability axis always spans
+    0 to 1, the variable axis the range of the values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    low, high = values.min(), values.max()
+    if high == low:
+        high = low + 1
+    x_edges = np.linspace(low, high, bins[0] + 1)
+    y_edges = np.linspace(0, 1, bins[1] + 1)
+    x = np.clip(((values - low) / (high - low) * bins[0]).astype(np.int64), 0, bins[0] - 1)
+    y = np.clip((np.asarray(probabilities) * bins[1]).astype(np.int64), 0, bins[1] - 1)
+    counts = np.bincount(x * bins[1] + y, minlength=bins[0] * bins[1]).reshape(bins)
+    return counts, x_edges, y_edges
+
+
+def probability_histograms(data, probabilities, target="Revenue", bins=BINS):
+    # histograms of all feature columns, computed once per model and data version
+    return {column: probability_histogram(data[column].to_numpy(), probabilities, bins)
+            for column in data.columns if column != target}
+
+
+def plot_probability(values, probabilities, variable, histogram=None, scatter_limit=SCATTER_LIMIT):
+    """Plot the revenue probability against ``variable``.
+
+    Small datasets are drawn point by point. Above ``scatter_limit`` sessions
+    (or if a precomputed ``histogram`` is given) the cells of the 2d
+    histogram are drawn instead, so the drawing cost depends on the number of
+    bins only and not on the number of sessions.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    fig, ax = plt.subplots(figsize=(10, 7.5))
+    if histogram is None and len(values) <= scatter_limit:
+        ax.scatter(values, probabilities, edgecolor='#4d4d4d', label=variable, alpha=0.8)
+        ax.legend().set_title("Variable")
+    else:
+        if histogram is None:
+            histogram = probability_histogram(values, probabilities)
+        counts, x_edges, y_edges = histogram
+        mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap="Blues", norm=LogNorm())
+        fig.colorbar(mesh, ax=ax).set_label("Anzahl Sessions", fontsize=15)
+    ax.set_xlabel(variable, fontsize=15)
+    ax.set_ylabel("Wahrscheinlichkeit einer Transaktion", fontsize=15)
+    ax.grid()
+    ax.set_facecolor("#f5f5fa")
+    return fig
@@ -0,0 +1,35 @@
+#####
+
+# precomputed revenue probabilities of the reference dataset
+
+#####
+
+import os
+
+import numpy as np
+
+from caching import cache_path, file_fingerprint
+from data_cache import feature_matrix
+
+
+def load_probabilities(model, data, model_path, data_path):
+    """Return P(Revenue = 1) for every row of ``data``.
+
+    The probabilities are stored in the cache directory under a key built from
+    the content of the model and the data file. They are only recomputed if one
+    of both files changes, otherwise the stored array is loaded from disk.
+    """
+    key = file_fingerprint(model_path, data_path)[:16]
+    path = cache_path("proba_{}.npy".format(key))
+    if os.path.exists(path):
+        probabilities = np.load(path)
+        if len(probabilities) == len(data):
+            return probabilities
+
+    probabilities = model.predict_proba(feature_matrix(data, model.get_booster().feature_names))[:, 1]
+    # write to a temporary file first so that concurrent sessions never read a half written array
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.save(f, probabilities)
+    os.replace(tmp_path, path)
+    return probabilities
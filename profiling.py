@@ -0,0 +1,155 @@
+#####
+
+# per-stage wall time and memory profiling of the web application
+
+#####
+
+# enable with APP_PROFILE=1 (streamlit run app.py), the records are appended as
+# JSON lines to APP_PROFILE_LOG (default .cache/profile.jsonl).
+# APP_PROFILE=time only measures wall time: tracemalloc slows down allocation
+# heavy stages considerably, so this is the mode for production traffic.
+# The peak memory of a stage is that of the whole process while it ran; it is
+# only the stage's own if no stage of another session ran at the same time
+# (otherwise the record has "shared": true and is left out of the summary).
+# python profiling.py [log file] prints p50/p95 per stage over all sessions.
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from caching import CACHE_DIR
+
+ENABLED = os.environ.get("APP_PROFILE", "") not in ("", "0")
+MEMORY = ENABLED and os.environ.get("APP_PROFILE") != "time"
+LOG_FILE = os.environ.get("APP_PROFILE_LOG", os.path.join(CACHE_DIR, "profile.jsonl"))
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_memory_lock = threading.Lock()
+# profiled stages running right now, in all threads
+_running = []
+_context = None
+
+if MEMORY:
+    tracemalloc.start()
+
+
+def set_context(provider):
+    """Register a function returning ``(session_id, records)`` of the running session.
+
+    ``records`` is a list-like object every finished stage is appended to
+    (e.g. a deque in the session state). It is called at the end of each
+    stage, so it always sees the session that runs the stage.
+    """
+    global _context
+    _context = provider
+
+
+def stage(name):
+    # context manager measuring one stage, does nothing if profiling is disabled
+    if not ENABLED:
+        return contextlib.nullcontext()
+    return _profiled(name) if MEMORY else _timed(name)
+
+
+@contextlib.contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record({"time": time.time(), "stage": name, "wall_ms": (time.perf_counter() - start) * 1000,
+                 "peak_kb": None})
+
+
+@contextlib.contextmanager
+def _profiled(name):
+    # peak memory is measured with tracemalloc (python and numpy allocations, not xgboost's own)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    entry = {"thread": threading.get_ident(), "shared": False}
+    with _memory_lock:
+        # peaks of nested stages are passed on to the enclosing stage
+        if stack:
+            stack[-1] = max(stack[-1], tracemalloc.get_traced_memory()[1])
+        others = [other for other in _running if other["thread"] != entry["thread"]]
+        for other in others:
+            other["shared"] = True
+        entry["shared"] = bool(others)
+        # the peak is not reset while another session is measuring it
+        if not others:
+            tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        _running.append(entry)
+    stack.append(0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        with _memory_lock:
+            _running.remove(entry)
+            peak = max(stack.pop(), tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1] = max(stack[-1], peak)
+        _record({"time": time.time(), "stage": name, "wall_ms": wall * 1000,
+                 "peak_kb": max(peak - start_memory, 0) / 1024, "shared": entry["shared"]})
+
+
+def _record(record):
+    if _context is not None:
+        try:
+            session, records = _context()
+            record["session"] = session
+            records.append(record)
+        except Exception:
+            # stages outside of a session (e.g. at import time) are only written to the log
+            pass
+    line = json.dumps(record)
+    with _log_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+        with open(LOG_FILE, "a") as f:
+            f.write(line + "\n")
+
+
+def summarize(lines):
+    """Aggregate JSON lines to ``{stage: {count, wall_p50_ms, wall_p95_ms, peak_p95_kb}}``.
+
+    Peaks measured while other sessions ran stages as well (``shared``) are left out.
+    """
+    wall = collections.defaultdict(list)
+    peak = collections.defaultdict(list)
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            wall[record["stage"]].append(record["wall_ms"])
+            if record["peak_kb"] is not None and not record.get("shared"):
+                peak[record["stage"]].append(record["peak_kb"])
+    return {name: {"count": len(wall[name]),
+                   "wall_p50_ms": float(np.percentile(wall[name], 50)),
+                   "wall_p95_ms": float(np.percentile(wall[name], 95)),
+                   "peak_p95_kb": float(np.percentile(peak[name], 95)) if peak[name] else None}
+            for name in sorted(wall)}
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else LOG_FILE
+    with open(path) as f:
+        summary = summarize(f)
+    print("{:<28} {:>7} {:>13} {:>13} {:>14}".format("stage", "count", "p50 [ms]", "p95 [ms]", "peak p95 [kB]"))
+    for name, values in summary.items():
+        peak = "-" if values["peak_p95_kb"] is None else "{:.1f}".format(values["peak_p95_kb"])
+        print("{:<28} {:>7} {:>13.2f} {:>13.2f} {:>14}".format(
+            name, values["count"], values["wall_p50_ms"], values["wall_p95_ms"], peak))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#####
+
+# size-bounded LRU cache for rendered figures
+
+#####
+
+import collections
+import io
+import threading
+
+import profiling
+
+# default memory budget for the stored images
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class RenderCache:
+    """Keep rendered figures as PNG bytes, keyed by everything the figure depends on.
+
+    ``get(key, render)`` returns the stored image for ``key``. On a miss
+    ``render()`` builds the matplotlib figure, which is encoded and closed
+    right away, so no figure outlives the call. The least recently used
+    images are dropped once the stored bytes exceed ``max_bytes``. One
+    instance is shared by all sessions.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, dpi=200):
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.images = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, render):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        # rendering happens outside of the lock, other sessions are not blocked meanwhile
+        # the first element of the key names the figure, e.g. "density"
+        with profiling.stage("plot_{}.build".format(key[0])):
+            fig = render()
+        try:
+            with profiling.stage("plot_{}.render".format(key[0])):
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format="png", bbox_inches="tight", dpi=self.dpi)
+        finally:
+            # imported here, render() has imported matplotlib already
+            import matplotlib.pyplot as plt
+
+            plt.close(fig)
+        image = buffer.getvalue()
+
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = image
+                self.bytes += len(image)
+            while self.bytes > self.max_bytes and len(self.images) > 1:
+                _, dropped = self.images.popitem(last=False)
+                self.bytes -= len(dropped)
+                self.evictions += 1
+        return image
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": self.hits / requests if requests else None,
+                    "entries": len(self.images),
+                    "bytes": self.bytes,
+                    "max_bytes": self.max_bytes,
+                    "evictions": self.evictions}
@@ -0,0 +1,73 @@
+#####
+
+# resources of the web application shared by all sessions: data, explanation table, models
+
+#####
+
+# The loaders are cached with st.cache_resource in this module rather than in
+# app.py, so the cache entries do not depend on the app script: serve.py fills
+# them at server start (warm_up) in the same process, before the first session
+# arrives, and app.py finds them ready.
+
+import importlib
+import os
+import time
+
+import streamlit as st
+
+import profiling
+from data_cache import load_dataset, load_table
+from inference import InferenceExecutor
+from model_registry import REGISTRY_DIR, LiveModels, ModelRegistry
+
+# other files can be used for benchmarks, e.g. APP_DATA_FILE=synthetic_1M.csv
+DATA_FILE = os.environ.get("APP_DATA_FILE", "online_shoppers_app_dev.csv")
+EXPLANATION_FILE = "Variable_Explanation.xlsx"
+
+
+# import dataset once per server process, all sessions share the same read-only, memory-mapped copy
+# with compact column types (int8 for dummies and codes, float32 otherwise); it is never copied as a whole
+@st.cache_resource()
+def load_data():
+    with profiling.stage("load_data"):
+        return load_dataset(DATA_FILE)
+
+
+# the Excel file is only read once, afterwards its binary copy in the cache directory
+@st.cache_resource()
+def load_variable_explanation():
+    return load_table(EXPLANATION_FILE).dropna()
+
+
+# predictions of all sessions run in one executor with a fixed thread budget
+# (APP_INFERENCE_THREADS, APP_INFERENCE_WORKERS) instead of all cores per session
+@st.cache_resource()
+def load_inference_executor():
+    return InferenceExecutor()
+
+
+# loaded model versions of the server process; a version activated in the registry is loaded and
+# warmed up in the background and replaces the live version once it is ready, no restart needed.
+# Only the registry is read, a pickled model is taken over offline (python model_registry.py import)
+@st.cache_resource()
+def load_live_models():
+    return LiveModels(ModelRegistry(REGISTRY_DIR), nthread=load_inference_executor().nthread)
+
+
+def warm_up():
+    """Load data, explanation table and the live model into the caches and return the seconds it took.
+
+    The pages of the memory-mapped dataset are read once, so the first session
+    does not wait for the disk. The model is warmed up with a dummy prediction
+    when it is loaded (ModelRegistry.load). The plotting modules, which the
+    app only imports when it draws the first figure, are imported as well.
+    """
+    start = time.perf_counter()
+    data = load_data()
+    for column in data.columns:
+        data[column].to_numpy().sum()
+    load_variable_explanation()
+    load_live_models().current()
+    for module in ("matplotlib.pyplot", "seaborn"):
+        importlib.import_module(module)
+    return time.perf_counter() - start
@@ -0,0 +1,259 @@
+#####
+
+# headless real-time scoring service with micro-batching
+
+#####
+
+# usage: python scoring_service.py --port 8000 --max-batch-size 64 --max-wait-ms 5 [--version <version>]
+#
+# The model is loaded from the registry (model_registry.py), by default its active version.
+#
+# POST /predict   one session as JSON object (raw or dummy-encoded fields)
+#                 -> {"probability": 0.12, "prediction": 0}
+# GET  /metrics   latency percentiles, throughput and batch statistics
+# GET  /health    -> {"status": "ok"}
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureEncoder
+from model_registry import REGISTRY_DIR, ModelRegistry
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class ServiceStats:
+    """Request counters and a window of recent request latencies."""
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.latencies = collections.deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_rows = 0
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_rows += size
+
+    def record_request(self, seconds, failed=False):
+        self.requests += 1
+        self.errors += failed
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        latencies = np.asarray(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 99]) if len(latencies) else [None, None]
+        return {"requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_rows / self.batches if self.batches else None,
+                "uptime_s": uptime,
+                "throughput_rps": self.requests / uptime if uptime else None,
+                "latency_p50_ms": percentiles[0],
+                "latency_p99_ms": percentiles[1]}
+
+
+class MicroBatcher:
+    """Collect concurrent single-session requests and score them together.
+
+    A batch is sent to the worker pool as soon as it holds ``max_batch_size``
+    sessions or the first session in it has waited ``max_wait_ms``. With
+    ``max_batch_size=1`` every request is predicted on its own.
+    """
+
+    def __init__(self, model, encoder, max_batch_size=64, max_wait_ms=5.0, workers=1):
+        self.model = model
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(workers)
+        # at most one batch per worker is in flight, further requests keep collecting in the queue
+        self.slots = asyncio.Semaphore(workers)
+        self.queue = asyncio.Queue()
+        self.stats = ServiceStats()
+
+    async def submit(self, session):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((session, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self.slots.acquire()
+            loop.create_task(self._score(batch))
+
+    async def _score(self, batch):
+        try:
+            sessions = [session for session, _ in batch]
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self._predict, sessions)
+            self.stats.record_batch(len(batch))
+            # a session that could not be encoded only fails its own request
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self.slots.release()
+
+    def _predict(self, sessions):
+        """Probability of every session, or the exception its encoding raised.
+
+        The encoder reads the format of a column (raw or dummy-encoded) from
+        its values, so sessions are grouped by their fields and value types and
+        every group is encoded as one frame. Only a group whose encoding fails
+        is encoded again session by session, to find the sessions that fail.
+        """
+        groups = collections.defaultdict(list)
+        for i, session in enumerate(sessions):
+            groups[frozenset((name, type(value)) for name, value in session.items())].append(i)
+        results = [None] * len(sessions)
+        rows = []
+        for indices in groups.values():
+            try:
+                rows.append((indices, self.encoder.transform(pd.DataFrame.from_records(
+                    [sessions[i] for i in indices]))))
+            except (ValueError, TypeError):
+                for i in indices:
+                    try:
+                        rows.append(([i], self.encoder.transform(pd.DataFrame.from_records([sessions[i]]))))
+                    except (ValueError, TypeError) as error:
+                        results[i] = error
+        if rows:
+            probabilities = self.model.predict_proba(np.vstack([matrix for _, matrix in rows]))[:, 1]
+            for i, probability in zip([i for indices, _ in rows for i in indices], probabilities):
+                results[i] = float(probability)
+        return results
+
+
+class ScoringService:
+    """Minimal HTTP/1.1 server (keep-alive, JSON only) in front of a MicroBatcher."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n".format(
+                    status, REASONS[status], len(data)).encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return 200, self.batcher.stats.snapshot()
+        if method == "POST" and path == "/predict":
+            return await self.predict(body)
+        return 404, {"error": "unknown endpoint {} {}".format(method, path)}
+
+    async def predict(self, body):
+        start = time.perf_counter()
+        try:
+            session = json.loads(body)
+            if not isinstance(session, dict):
+                raise ValueError("expected one session as JSON object")
+            missing = self.batcher.encoder.missing_columns(session)
+            if missing:
+                raise ValueError("missing fields: {}".format(", ".join(missing)))
+        except ValueError as error:
+            self.batcher.stats.record_request(time.perf_counter() - start, failed=True)
+            return 400, {"error": str(error)}
+        try:
+            probability = await self.batcher.submit(session)
+        except (ValueError, TypeError) as error:
+            # the session could not be encoded
+            self.batcher.stats.record_request(time.perf_counter() - start, failed=True)
+            return 400, {"error": str(error)}
+        except Exception as error:
+            self.batcher.stats.record_request(time.perf_counter() - start, failed=True)
+            return 500, {"error": str(error)}
+        self.batcher.stats.record_request(time.perf_counter() - start)
+        return 200, {"probability": probability, "prediction": int(probability > 0.5)}
+
+
+async def serve(model, host="127.0.0.1", port=8000, **batcher_options):
+    encoder = FeatureEncoder.from_model(model)
+    batcher = MicroBatcher(model, encoder, **batcher_options)
+    service = ScoringService(batcher)
+    batch_task = asyncio.get_running_loop().create_task(batcher.run())
+    server = await asyncio.start_server(service.handle, host, port)
+    print("scoring service listening on http://{}:{}".format(host, port), flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time scoring service for the revenue model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--version", default=None, help="model version, default: the active one")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--max-batch-size", type=int, default=64, help="1 scores every request on its own")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="longest time a request waits for a batch")
+    parser.add_argument("--workers", type=int, default=1, help="threads of the inference pool")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    version = args.version or registry.active_version()
+    if version is None:
+        parser.error("no active model version in {}, import one first: "
+                     "python model_registry.py import <model.sav> --activate".format(args.registry))
+    model = registry.load(version).model
+    asyncio.run(serve(model, args.host, args.port, max_batch_size=args.max_batch_size,
+                      max_wait_ms=args.max_wait_ms, workers=args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#####
+
+# parallel, resumable hyperparameter search with successive halving
+
+#####
+
+# usage: python search.py Data/clean_data.csv [--space tree] [--workers 4] [--eta 3] [--cv 5]
+#
+# Replaces the exhaustive GridSearchCV of Trees_Forests.ipynb. All configurations
+# start on a small sample of the data, only the best 1/eta of every round go on
+# to eta times more data, the last round uses all rows. The trials of a round run
+# in a process pool. Every finished trial is appended to a store on disk, so an
+# interrupted search resumes where it stopped and a configuration that was
+# already evaluated (same estimator and parameters, data, sample size, folds) is
+# never trained again.
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+from caching import cache_path, file_fingerprint
+
+# (estimator, fixed parameters, searched grid) - "tree" is the grid of Trees_Forests.ipynb
+# every trial runs single threaded, the parallelism comes from the process pool
+SPACES = {
+    "tree": (DecisionTreeClassifier, {"criterion": "entropy", "random_state": 1},
+             {"max_depth": list(range(1, 30)), "min_samples_leaf": [1, 10, 20, 30, 50, 100]}),
+    "forest": (RandomForestClassifier, {"random_state": 1, "n_jobs": 1},
+               {"n_estimators": [200, 500, 2000], "max_features": ["sqrt", 0.5], "min_samples_leaf": [1, 5, 20]}),
+    "xgboost": (XGBClassifier, {"random_state": 1, "n_estimators": 500, "learning_rate": 0.01,
+                                "tree_method": "hist", "n_jobs": 1},
+                {"max_depth": [4, 8, 12, 20], "reg_alpha": [0, 1, 6], "min_child_weight": [1, 5]}),
+}
+TARGET = "Revenue"
+STORE_FILE = "search_trials.jsonl"
+
+
+class TrialStore:
+    """Append-only JSON lines file with one line per finished trial.
+
+    Trials are looked up by ``key``, a hash of everything the score depends
+    on. A line that was cut off by an interruption is ignored on loading.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trials = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        trial = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.trials[trial["key"]] = trial
+
+    def get(self, key):
+        return self.trials.get(key)
+
+    def add(self, trial):
+        with self.lock:
+            self.trials[trial["key"]] = trial
+            with open(self.path, "a") as f:
+                f.write(json.dumps(trial) + "\n")
+
+
+def trial_key(space, params, n_samples, cv, scoring, seed, data_fingerprint):
+    # estimator and fixed parameters of the space are part of the key, so editing SPACES starts new trials
+    estimator, fixed, _ = SPACES[space]
+    text = json.dumps([space, "{}.{}".format(estimator.__module__, estimator.__qualname__), fixed, params,
+                       n_samples, cv, scoring, seed, data_fingerprint], sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def rung_sizes(n_candidates, n_rows, eta=3, min_samples=500):
+    # number of rows per round: eta times more every round, the last round uses all rows
+    rounds = max(1, math.ceil(math.log(n_candidates, eta))) if n_candidates > 1 else 1
+    sizes = [max(min_samples, int(n_rows / eta ** (rounds - 1 - r))) for r in range(rounds)]
+    return sorted(set(min(size, n_rows) for size in sizes))
+
+
+# data of a worker process, read once by the pool initializer
+_worker_data = {}
+
+
+def _init_worker(data_path, target, seed):
+    data = pd.read_csv(data_path)
+    # one fixed shuffle, a round with n rows uses the first n, so smaller samples are part of larger ones
+    order = np.random.default_rng(seed).permutation(len(data))
+    _worker_data["X"] = data.drop(columns=target).iloc[order].reset_index(drop=True)
+    _worker_data["y"] = data[target].iloc[order].reset_index(drop=True)
+
+
+def _run_trial(space, params, n_samples, cv, scoring, seed):
+    estimator, fixed, _ = SPACES[space]
+    start = time.perf_counter()
+    scores = cross_val_score(estimator(**fixed, **params),
+                             _worker_data["X"].iloc[:n_samples], _worker_data["y"].iloc[:n_samples],
+                             cv=StratifiedKFold(cv, shuffle=True, random_state=seed), scoring=scoring)
+    return {"score": float(scores.mean()), "score_std": float(scores.std()), "seconds": time.perf_counter() - start}
+
+
+def successive_halving(data_path, space="tree", grid=None, cv=5, eta=3, scoring="accuracy", workers=None,
+                       min_samples=500, seed=1, store=None, target=TARGET, on_trial=None):
+    """Search the grid of ``space`` (or ``grid``) on the data in ``data_path``.
+
+    Returns a dict with the best parameters, their cross-validated score on
+    all rows, the rounds (sample size and scores of every candidate), the
+    number of trials that were trained and that came from the store, and the
+    wall time. ``on_trial(trial)`` is called for every finished trial.
+    """
+    start = time.perf_counter()
+    store = store if store is not None else TrialStore(cache_path(STORE_FILE))
+    fingerprint = file_fingerprint(data_path)
+    candidates = list(ParameterGrid(SPACES[space][2] if grid is None else grid))
+    n_rows = len(pd.read_csv(data_path, usecols=[target]))
+    trained = 0
+    reused = 0
+    rounds = []
+
+    with concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker,
+                                                initargs=(data_path, target, seed)) as pool:
+        sizes = rung_sizes(len(candidates), n_rows, eta, min_samples)
+        for i, n_samples in enumerate(sizes):
+            results = {}
+            futures = {}
+            for index, params in enumerate(candidates):
+                key = trial_key(space, params, n_samples, cv, scoring, seed, fingerprint)
+                trial = store.get(key)
+                if trial is not None:
+                    results[index] = trial
+                    reused += 1
+                else:
+                    futures[pool.submit(_run_trial, space, params, n_samples, cv, scoring, seed)] = (index, key)
+            for future in concurrent.futures.as_completed(futures):
+                index, key = futures[future]
+                trial = dict(future.result(), key=key, space=space, params=candidates[index], n_samples=n_samples,
+                             elapsed=time.perf_counter() - start)
+                store.add(trial)
+                results[index] = trial
+                trained += 1
+                if on_trial is not None:
+                    on_trial(trial)
+
+            ranking = sorted(results, key=lambda index: results[index]["score"], reverse=True)
+            rounds.append({"n_samples": n_samples,
+                           "candidates": [(candidates[index], results[index]["score"]) for index in ranking]})
+            if i < len(sizes) - 1:
+                candidates = [candidates[index] for index in ranking[:max(1, math.ceil(len(ranking) / eta))]]
+            else:
+                best = results[ranking[0]]
+
+    return {"best_params": best["params"],
+            "best_score": best["score"],
+            "rounds": rounds,
+            "trained": trained,
+            "reused": reused,
+            "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive halving hyperparameter search")
+    parser.add_argument("data", help="csv file in the format of clean_data.csv")
+    parser.add_argument("--space", default="tree", choices=sorted(SPACES))
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--scoring", default="accuracy")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--min-samples", type=int, default=500)
+    parser.add_argument("--store", default=None, help="trial store (default .cache/{})".format(STORE_FILE))
+    args = parser.parse_args()
+
+    store = TrialStore(args.store) if args.store else None
+    result = successive_halving(args.data, args.space, cv=args.cv, eta=args.eta, scoring=args.scoring,
+                                workers=args.workers, min_samples=args.min_samples, store=store)
+    for i, rung in enumerate(result["rounds"]):
+        print("round {}: {} candidates on {} rows, best {:.4f}".format(
+            i + 1, len(rung["candidates"]), rung["n_samples"], rung["candidates"][0][1]))
+    print("best parameters:", result["best_params"])
+    print("best {}: {:.4f}".format(args.scoring, result["best_score"]))
+    print("{} trials trained, {} taken from the store, {:.1f} s".format(
+        result["trained"], result["reused"], result["seconds"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#####
+
+# independently rerunnable sections of the web application
+
+#####
+
+import collections
+
+import streamlit as st
+
+
+def section(name, inputs, compute):
+    """Return ``compute()`` for the given ``inputs`` of section ``name``.
+
+    The result is remembered per session together with the inputs it was
+    computed from. As long as the inputs stay the same, the remembered result
+    is returned and ``compute`` is skipped. Every actual computation is
+    counted in ``st.session_state["section_runs"]``.
+    """
+    results = st.session_state.setdefault("section_results", {})
+    runs = st.session_state.setdefault("section_runs", collections.Counter())
+    remembered = results.get(name)
+    if remembered is not None and remembered[0] == inputs:
+        return remembered[1]
+    result = compute()
+    results[name] = (inputs, result)
+    runs[name] += 1
+    return result
+
+
+def section_runs():
+    return dict(st.session_state.get("section_runs", {}))
@@ -0,0 +1,43 @@
+#####
+
+# starts the web application with data and model preloaded
+
+#####
+
+# usage: python serve.py [streamlit options, e.g. --server.port 8501]
+#
+# Same as `streamlit run app.py`, but data, explanation table and the live
+# model are loaded and warmed up in a background thread as soon as the server
+# process starts (resources.warm_up), instead of in the first session. The
+# server accepts connections meanwhile; a session that arrives before the
+# warm-up is finished waits for the same cache entries instead of loading
+# them a second time.
+
+import logging
+import os
+import sys
+import threading
+
+from streamlit.web import cli
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def warm_up():
+    # imported here, the server does not wait for pandas and xgboost
+    import resources
+
+    # the caches warn about every call outside of a session, which is intended here
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    seconds = resources.warm_up()
+    print("data and model preloaded in {:.1f} s".format(seconds), flush=True)
+
+
+def main():
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    sys.argv = ["streamlit", "run", APP_FILE] + sys.argv[1:]
+    cli.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#####
+
+# FeatureEncoder has to give exactly the model matrix of preprocess_data
+
+#####
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeatureEncoder, preprocess_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_FILE = os.path.join(ROOT, "Data", "online_shoppers_intention.csv")
+DATA_FILE = os.path.join(ROOT, "online_shoppers_app_dev.csv")
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.read_csv(RAW_FILE)
+
+
+@pytest.fixture(scope="module")
+def expected(raw):
+    # model matrix as in best_model_complete_notebook.ipynb
+    return preprocess_data(raw.copy()).drop(columns="Revenue")
+
+
+@pytest.fixture(scope="module")
+def encoder(expected):
+    return FeatureEncoder(expected.columns)
+
+
+def test_raw_rows_match_preprocess_data(raw, expected, encoder):
+    matrix = encoder.transform(raw)
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(matrix, expected.to_numpy(np.float32))
+
+
+def test_dummy_encoded_rows_pass_through():
+    # the format of the app data, columns in the order of the model
+    data = pd.read_csv(DATA_FILE).drop(columns="Revenue")
+    encoder = FeatureEncoder(data.columns)
+    np.testing.assert_array_equal(encoder.transform(data), data.to_numpy(np.float32))
+
+
+def test_column_order_does_not_depend_on_the_input(raw, encoder):
+    shuffled = raw[list(np.random.default_rng(0).permutation(raw.columns))]
+    np.testing.assert_array_equal(encoder.transform(shuffled), encoder.transform(raw))
+    # a few rows do not contain every category, the dummy columns are there all the same
+    few = raw[raw["VisitorType"] == "New_Visitor"].head(3)
+    assert encoder.transform(few).shape == (3, len(encoder.feature_names))
+
+
+def test_unknown_categories(raw, expected):
+    unknown = raw.head(4).copy()
+    unknown["VisitorType"] = ["Bot", "New_Visitor", "Other", "Returning_Visitor"]
+    unknown["Month"] = ["Feb", "Smarch", "Mar", "May"]
+
+    matrix = FeatureEncoder(expected.columns, handle_unknown="missing").transform(unknown)
+    dummies = [expected.columns.get_loc(name) for name in ("VisitorType_New_Visitor", "VisitorType_Returning_Visitor")]
+    month = expected.columns.get_loc("Month")
+    assert np.isnan(matrix[0, dummies]).all() and not np.isnan(matrix[1:, dummies]).any()
+    assert np.isnan(matrix[1, month]) and not np.isnan(matrix[[0, 2, 3], month]).any()
+
+    with pytest.raises(ValueError, match="Month: Smarch"):
+        FeatureEncoder(expected.columns, handle_unknown="error").transform(unknown)
+    with pytest.raises(ValueError, match="VisitorType: Bot"):
+        FeatureEncoder(expected.columns, handle_unknown="error").transform(unknown.assign(Month="Feb"))
+
+
+def test_mixed_raw_and_dummy_encoded_columns(raw, expected, encoder):
+    # Month and Weekend raw, VisitorType already as dummy columns
+    dummies = ["VisitorType_New_Visitor", "VisitorType_Returning_Visitor"]
+    mixed = pd.concat([raw.drop(columns="VisitorType"), expected[dummies]], axis=1)
+    np.testing.assert_array_equal(encoder.transform(mixed), expected.to_numpy(np.float32))
+    # and the other way round
+    mixed = expected.drop(columns=dummies).assign(VisitorType=raw["VisitorType"])
+    np.testing.assert_array_equal(encoder.transform(mixed), expected.to_numpy(np.float32))
@@ -0,0 +1,85 @@
+#####
+
+# TreeEngine has to give exactly the predictions of xgboost
+
+#####
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost
+
+from tree_engine import TreeEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ROOT, "online_shoppers_app_dev.csv")
+MODEL_FILE = os.path.join(ROOT, "finalized_default_model.sav")
+
+
+@pytest.fixture(scope="module")
+def data():
+    data = pd.read_csv(DATA_FILE)
+    return data.drop(columns="Revenue"), data["Revenue"]
+
+
+@pytest.fixture(scope="module")
+def matrices(data):
+    X = data[0].to_numpy(np.float32)
+    # missing values follow the default direction of every split
+    X_missing = X.copy()
+    X_missing[::7, 8] = np.nan
+    X_missing[::5, 3] = np.nan
+    return X, X_missing
+
+
+def small_model(data, **params):
+    X, y = data
+    return xgboost.XGBClassifier(n_estimators=30, max_depth=6, random_state=0, **params).fit(X, y)
+
+
+def check(model, X):
+    engine = TreeEngine.from_model(model)
+    booster = model.get_booster()
+    margin = booster.predict(xgboost.DMatrix(X, feature_names=booster.feature_names), output_margin=True)
+    # margins bitwise; the probabilities can differ in the last float32 bits (exp of the C library)
+    np.testing.assert_array_equal(engine.predict_margin(X), margin)
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=1e-6)
+    np.testing.assert_array_equal(engine.predict(X), model.predict(X))
+
+
+def test_matches_xgboost(data, matrices):
+    model = small_model(data)
+    for X in matrices:
+        check(model, X)
+
+
+def test_matches_xgboost_with_base_score(data, matrices):
+    check(small_model(data, base_score=0.15), matrices[1])
+
+
+def test_dataframe_in_model_order(data):
+    model = small_model(data)
+    engine = TreeEngine.from_model(model)
+    frame = data[0].iloc[:50]
+    shuffled = frame[frame.columns[::-1]]
+    np.testing.assert_array_equal(engine.predict_margin(shuffled), engine.predict_margin(frame.to_numpy(np.float32)))
+
+
+def test_save_and_load(data, matrices, tmp_path):
+    engine = TreeEngine.from_model(small_model(data))
+    engine.save(tmp_path / "engine.npz")
+    loaded = TreeEngine.load(tmp_path / "engine.npz")
+    assert loaded.feature_names == engine.feature_names
+    np.testing.assert_array_equal(loaded.predict_margin(matrices[1]), engine.predict_margin(matrices[1]))
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_FILE), reason="the trained model is not available")
+def test_matches_app_model(matrices):
+    import pickle
+
+    with open(MODEL_FILE, "rb") as f:
+        model = pickle.load(f)
+    for X in matrices:
+        check(model, X)
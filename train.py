@@ -0,0 +1,204 @@
+#####
+
+# out-of-core training of the revenue model, scriptable version of best_model_complete_notebook.ipynb
+
+#####
+
+# usage: python train.py Data/online_shoppers_intention.csv [--external-memory] [--rounds 500]
+#
+# The raw csv (format of online_shoppers_intention.csv) is read in chunks and
+# every chunk is encoded like preprocess_data does it. The chunks are fed to
+# xgboost's quantile ``hist`` method through a DataIter, so the full data never
+# exists as a DataFrame: in-core only the quantized matrix (1 byte per value)
+# is kept, with --external-memory the quantized pages are cached on disk.
+# 5 % of the sessions are held out for evaluation, like the notebook's test split.
+
+import argparse
+import datetime
+import json
+import os
+import pickle
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost
+from sklearn.metrics import accuracy_score, f1_score, log_loss, roc_auc_score
+
+from caching import cache_path, file_fingerprint
+from features import FeatureEncoder
+from model_registry import ModelRegistry
+
+# parameters of the XGBClassifier in best_model_complete_notebook.ipynb, trained with the hist method
+PARAMS = {"objective": "binary:logistic", "max_depth": 20, "learning_rate": 0.01, "reg_alpha": 6,
+          "tree_method": "hist", "max_bin": 256, "seed": 1}
+N_ROUNDS = 500
+CHUNK_SIZE = 200000
+TEST_SIZE = 0.05
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+class RawChunks(xgboost.DataIter):
+    """Stream a raw csv file to xgboost chunk by chunk.
+
+    xgboost may go through the data several times (``reset`` starts over).
+    The holdout rows of a chunk are drawn from a generator seeded with the
+    chunk number, so every pass holds out exactly the same sessions. They are
+    collected during the first pass only.
+    """
+
+    def __init__(self, path, encoder, chunk_size=CHUNK_SIZE, test_size=TEST_SIZE, seed=1, cache_prefix=None):
+        super().__init__(cache_prefix=cache_prefix)
+        self.path = path
+        self.encoder = encoder
+        self.chunk_size = chunk_size
+        self.test_size = test_size
+        self.seed = seed
+        self.rows = 0
+        self.holdout = []
+        self._reader = None
+        self._chunk = 0
+        self._first_pass = True
+
+    def next(self, input_data):
+        if self._reader is None:
+            self._reader = pd.read_csv(self.path, chunksize=self.chunk_size)
+        chunk = next(self._reader, None)
+        if chunk is None:
+            return False
+        matrix = self.encoder.transform(chunk)
+        label = chunk["Revenue"].to_numpy(dtype=np.float32)
+        test = np.random.default_rng([self.seed, self._chunk]).random(len(chunk)) < self.test_size
+        if self._first_pass:
+            self.rows += int((~test).sum())
+            self.holdout.append((matrix[test], label[test]))
+        input_data(data=matrix[~test], label=label[~test], feature_names=self.encoder.feature_names)
+        self._chunk += 1
+        return True
+
+    def reset(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+            self._first_pass = False
+        self._chunk = 0
+
+    def holdout_data(self):
+        return (np.concatenate([matrix for matrix, _ in self.holdout]),
+                np.concatenate([label for _, label in self.holdout]))
+
+
+def evaluate(booster, matrix, label):
+    # metrics on the held-out sessions, the notebook looked at the classification report
+    if len(label) == 0:
+        return {}
+    probabilities = booster.predict(xgboost.DMatrix(matrix, feature_names=booster.feature_names))
+    predictions = probabilities > 0.5
+    metrics = {"holdout_rows": int(len(label)),
+               "accuracy": accuracy_score(label, predictions),
+               "f1_revenue": f1_score(label, predictions, zero_division=0),
+               "log_loss": log_loss(label, probabilities, labels=[0, 1])}
+    if 0 < label.sum() < len(label):
+        metrics["roc_auc"] = roc_auc_score(label, probabilities)
+    return metrics
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train(raw_path, rounds=N_ROUNDS, external_memory=False, nthread=None, chunk_size=CHUNK_SIZE,
+          test_size=TEST_SIZE, seed=1):
+    """Train the revenue model on a raw csv file.
+
+    Returns ``(model, info)``: an ``XGBClassifier`` that can be used like the
+    pickled model of the notebook and a dict with data size, timings, peak
+    memory and holdout metrics. ``nthread=None`` uses all cores.
+    """
+    nthread = nthread or os.cpu_count()
+    start = time.perf_counter()
+    encoder = FeatureEncoder.from_columns(pd.read_csv(raw_path, nrows=0).columns)
+    params = dict(PARAMS, seed=seed, nthread=nthread)
+
+    # external memory pages go to the cache directory, /tmp is often a small RAM disk
+    pages_dir = cache_path("training")
+    os.makedirs(pages_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=pages_dir) as pages:
+        chunks = RawChunks(raw_path, encoder, chunk_size, test_size, seed,
+                           cache_prefix=os.path.join(pages, "pages") if external_memory else None)
+        if external_memory:
+            dtrain = xgboost.ExtMemQuantileDMatrix(chunks, max_bin=params["max_bin"], nthread=nthread)
+        else:
+            dtrain = xgboost.QuantileDMatrix(chunks, max_bin=params["max_bin"], nthread=nthread)
+        load_seconds = time.perf_counter() - start
+        booster = xgboost.train(params, dtrain, num_boost_round=rounds)
+        del dtrain
+    train_seconds = time.perf_counter() - start - load_seconds
+
+    # the sklearn wrapper keeps the interface the app uses (predict_proba, get_booster)
+    model = xgboost.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+
+    info = {"train_rows": chunks.rows,
+            "rounds": rounds,
+            "params": params,
+            "external_memory": external_memory,
+            "load_seconds": load_seconds,
+            "train_seconds": train_seconds,
+            "metrics": evaluate(booster, *chunks.holdout_data())}
+    info["wall_seconds"] = time.perf_counter() - start
+    info["peak_rss_mb"] = peak_rss_mb()
+    return model, info
+
+
+def save_model(model, info, raw_path, directory=MODEL_DIR):
+    """Write the model as ``revenue_model_<version>.sav`` and its metadata as ``.json``.
+
+    The version is the training time plus the beginning of the data
+    fingerprint, so an artifact is never overwritten and its training data can
+    be told apart.
+    """
+    version = "{}_{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), file_fingerprint(raw_path)[:8])
+    os.makedirs(directory, exist_ok=True)
+    model_path = os.path.join(directory, "revenue_model_{}.sav".format(version))
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    metadata = dict(info, version=version, data_file=os.path.abspath(raw_path),
+                    data_fingerprint=file_fingerprint(raw_path), xgboost_version=xgboost.__version__,
+                    feature_names=model.get_booster().feature_names)
+    with open(os.path.join(directory, "revenue_model_{}.json".format(version)), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return model_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the revenue model on a raw csv file")
+    parser.add_argument("data", help="csv file in the format of online_shoppers_intention.csv")
+    parser.add_argument("--rounds", type=int, default=N_ROUNDS)
+    parser.add_argument("--external-memory", action="store_true", help="cache the quantized data on disk")
+    parser.add_argument("--nthread", type=int, default=None, help="default: all cores")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--out-dir", default=MODEL_DIR)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--register", action="store_true", help="also add the model to the model registry")
+    parser.add_argument("--activate", action="store_true", help="register the model and make it the live version")
+    args = parser.parse_args()
+
+    model, info = train(args.data, args.rounds, args.external_memory, args.nthread, args.chunk_size, seed=args.seed)
+    model_path = save_model(model, info, args.data, args.out_dir)
+    print("model written to", model_path)
+    print("training rows: {}, wall time: {:.1f} s (data {:.1f} s, boosting {:.1f} s), peak RSS: {:.0f} MB".format(
+        info["train_rows"], info["wall_seconds"], info["load_seconds"], info["train_seconds"], info["peak_rss_mb"]))
+    for name, value in info["metrics"].items():
+        print("  {}: {}".format(name, round(value, 4)))
+    if args.register or args.activate:
+        version = ModelRegistry().register(model, data_fingerprint=file_fingerprint(args.data), metrics=info["metrics"],
+                                           activate=args.activate, rounds=args.rounds, params=info["params"])
+        print("registered as version", version, "(active)" if args.activate else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#####
+
+# numpy inference engine for the boosted tree model
+
+#####
+
+import json
+
+import numpy as np
+
+# upper bound for rows x trees handled in one block of the traversal
+BLOCK_SIZE = 1 << 20
+
+
+class TreeEngine:
+    """Score a binary:logistic xgboost model with plain numpy.
+
+    All trees are exported into one flat node table (children, split feature,
+    threshold, default direction, leaf value). A batch is scored level by
+    level: in every step all (row, tree) pairs move one node down at once, so
+    there is no per-call DMatrix construction and small inputs such as a
+    single session are cheap. Pairs that reached a leaf leave the active set,
+    so deep but sparse trees only cost what their actual paths cost.
+
+    Margins are summed in the same order and precision as xgboost and are
+    bitwise equal to its output margins. The probabilities can differ in the
+    last float32 bit only, where the exp of the C library rounds differently.
+    """
+
+    def __init__(self, left, right, feature, threshold, default_left, value, roots, base_margin,
+                 feature_names=None):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_margin = np.float32(base_margin)
+        self.feature_names = feature_names
+        self.is_leaf = left == np.arange(len(left))
+        # children interleaved as [left, right], the next node is children[2 * node + go_right]
+        self.children = np.column_stack([left, right]).ravel()
+
+    @classmethod
+    def from_booster(cls, booster):
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError("TreeEngine only supports binary:logistic models, got {}".format(objective))
+        # newer xgboost versions write the base score as "[1.5E-1]"
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        trees = learner["gradient_booster"]["model"]["trees"]
+
+        left, right, feature, threshold, default_left, value, roots = [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            tree_left = np.asarray(tree["left_children"], dtype=np.int32)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int32)
+            nodes = np.arange(len(tree_left), dtype=np.int32)
+            leaf = tree_left == -1
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            # leaf values are stored in the split conditions of the leaf nodes
+            left.append(np.where(leaf, nodes, tree_left) + offset)
+            right.append(np.where(leaf, nodes, tree_right) + offset)
+            feature.append(np.where(leaf, 0, tree["split_indices"]).astype(np.int32))
+            threshold.append(np.where(leaf, 0, conditions).astype(np.float32))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(leaf, conditions, 0).astype(np.float32))
+            roots.append(offset)
+            offset += len(nodes)
+
+        return cls(np.concatenate(left), np.concatenate(right), np.concatenate(feature),
+                   np.concatenate(threshold), np.concatenate(default_left), np.concatenate(value),
+                   np.asarray(roots, dtype=np.int32), np.log(base_score / (1 - base_score)),
+                   feature_names=booster.feature_names)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls.from_booster(model.get_booster())
+
+    def save(self, path):
+        np.savez(path, left=self.left, right=self.right, feature=self.feature, threshold=self.threshold,
+                 default_left=self.default_left, value=self.value, roots=self.roots,
+                 base_margin=self.base_margin, feature_names=np.asarray(self.feature_names or [], dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as tables:
+            feature_names = [str(name) for name in tables["feature_names"]] or None
+            return cls(tables["left"], tables["right"], tables["feature"], tables["threshold"],
+                       tables["default_left"], tables["value"], tables["roots"],
+                       tables["base_margin"], feature_names=feature_names)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaves(self, X, n_trees=None):
+        """Return the leaf node reached by every row in every tree, shape (rows, trees)."""
+        X = self._as_matrix(X)
+        roots = self.roots if n_trees is None else self.roots[:n_trees]
+        has_nan = bool(np.isnan(X).any())
+        out = np.empty((len(X), len(roots)), dtype=np.int32)
+        block = max(1, BLOCK_SIZE // max(len(roots), 1))
+        for start in range(0, len(X), block):
+            rows = X[start:start + block]
+            flat = rows.ravel()
+            # one entry per (row, tree) pair, pairs that reached a leaf are dropped from the active set
+            node = np.tile(roots, len(rows))
+            offset = np.repeat(np.arange(len(rows), dtype=np.int64) * X.shape[1], len(roots))
+            active = np.arange(len(node))
+            while len(active):
+                current = node[active]
+                inner = ~self.is_leaf[current]
+                active = active[inner]
+                current = current[inner]
+                x = flat[offset[active] + self.feature[current]]
+                go_right = x >= self.threshold[current]
+                if has_nan:
+                    missing = np.isnan(x)
+                    go_right[missing] = ~self.default_left[current[missing]]
+                node[active] = self.children[2 * current + go_right]
+            out[start:start + block] = node.reshape(len(rows), len(roots))
+        return out
+
+    def predict_margin(self, X, n_trees=None):
+        leaves = self.leaves(X, n_trees)
+        # add the trees one after another to the base margin in float32, like xgboost does;
+        # cumsum adds strictly in order, unlike sum, which adds pairwise
+        values = np.empty((leaves.shape[0], leaves.shape[1] + 1), dtype=np.float32)
+        values[:, 0] = self.base_margin
+        np.take(self.value, leaves, out=values[:, 1:])
+        return np.cumsum(values, axis=1, out=values)[:, -1].copy()
+
+    def predict_proba(self, X, n_trees=None):
+        # same layout as XGBClassifier.predict_proba: columns for class 0 and class 1
+        margin = self.predict_margin(X, n_trees)
+        # xgboost rounds exp(-margin) to float32 before the division
+        exp = np.exp(-margin.astype(np.float64)).astype(np.float32)
+        positive = np.float32(1) / (exp + np.float32(1))
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X, n_trees=None):
+        return (self.predict_proba(X, n_trees)[:, 1] > 0.5).astype(int)
+
+    def _as_matrix(self, X):
+        if hasattr(X, "columns"):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float32, na_value=np.nan)
+        return np.ascontiguousarray(X, dtype=np.float32)
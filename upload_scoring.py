@@ -0,0 +1,83 @@
+#####
+
+# chunked scoring of uploaded customer data
+
+#####
+
+import os
+import tempfile
+import weakref
+
+import pandas as pd
+
+from contributions import ContributionWriter, predict_contributions
+
+# number of rows read, encoded and scored at once
+CHUNK_SIZE = 20000
+
+
+def _remove(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    del paths[:]
+
+
+class ResultFiles:
+    """Temporary result files of one session (e.g. kept in ``st.session_state``).
+
+    ``clear()`` removes all files handed out so far. The files are also removed
+    when the object is garbage collected, i.e. when the session ends, and at
+    the latest when the process exits.
+    """
+
+    def __init__(self):
+        self.paths = []
+        # the finalizer only holds the list, not the object itself
+        self._finalizer = weakref.finalize(self, _remove, self.paths)
+
+    def new(self, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        self.paths.append(path)
+        return path
+
+    def clear(self):
+        _remove(self.paths)
+
+
+def score_csv(source, model, encoder, out_path, chunk_size=CHUNK_SIZE, on_chunk=None, contributions_path=None):
+    """Score a csv file chunk by chunk and append the results to ``out_path``.
+
+    Every chunk is encoded with the ``FeatureEncoder`` of the model, so raw and
+    dummy-encoded files both work and all chunks see the same feature layout.
+    Only one chunk of the input is held in memory at a time. After every chunk
+    ``on_chunk(rows, positives)`` is called with the running number of scored
+    rows and predicted transactions. Returns the final ``(rows, positives)``.
+
+    With ``contributions_path`` the feature contributions (TreeSHAP) of every
+    row are written there as well, as float32 ``.npy`` file in the row order
+    of the output.
+    """
+    rows = 0
+    positives = 0
+    writer = ContributionWriter(contributions_path, len(encoder.feature_names) + 1) if contributions_path else None
+    try:
+        with open(out_path, "w", newline="", encoding="utf-8") as out:
+            for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_size)):
+                matrix = encoder.transform(chunk)
+                chunk["predictions"] = model.predict(matrix)
+                if writer is not None:
+                    writer.write(predict_contributions(model, matrix))
+                chunk.to_csv(out, header=(i == 0))
+                rows += len(chunk)
+                positives += int(chunk["predictions"].sum())
+                if on_chunk is not None:
+                    on_chunk(rows, positives)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
+    return rows, positives